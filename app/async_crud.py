@@ -0,0 +1,64 @@
+"""Versões assíncronas das leituras de `crud`, para os endpoints `async def`.
+
+Usam os mesmos SELECTs de `crud`, executados em uma `AsyncSession`
+(aiosqlite / asyncpg). Escritas continuam síncronas em `crud`.
+"""
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud, models
+
+async def get_imoveis(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return (await db.scalars(crud.imoveis_select(skip, limit))).all()
+
+async def get_imovel_by_id(db: AsyncSession, imovel_id: int):
+    return await db.get(models.Imovel, imovel_id)
+
+async def get_total_imoveis(db: AsyncSession):
+    return await db.scalar(crud.total_imoveis_select())
+
+async def get_imoveis_keyset(
+    db: AsyncSession,
+    limit: int = 100,
+    after: Optional[list] = None,
+    sort: str = 'id',
+    descending: bool = False,
+    fields: Optional[List[str]] = None
+):
+    return (await db.execute(crud.keyset_select(limit, after, sort, descending, fields))).all()
+
+async def get_scrape_job(db: AsyncSession, job_id: int):
+    return await db.scalar(select(models.ScrapeJob).where(models.ScrapeJob.id == job_id))
+
+async def get_price_history(db: AsyncSession, listing_id: str):
+    return (await db.scalars(crud.price_history_select(listing_id))).all()
+
+async def get_price_changes(
+    db: AsyncSession,
+    limit: int = 100,
+    after: Optional[list] = None,
+    cidade: Optional[str] = None,
+    tipo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    drops_only: bool = False
+):
+    return (await db.scalars(crud.price_changes_select(limit, after, cidade, tipo, since, drops_only))).all()
+
+async def get_duplicates(db: AsyncSession, db_imovel: models.Imovel):
+    return (await db.scalars(crud.duplicates_select(db_imovel))).all()
+
+async def get_duplicate_clusters(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cidade: Optional[str] = None,
+    tipo: Optional[str] = None
+):
+    """Grupos de quase duplicados, cada um com os ids dos seus imóveis."""
+    clusters = (await db.execute(crud.duplicate_clusters_select(skip, limit, cidade, tipo))).all()
+    members = {}
+    if clusters:
+        for cluster_id, imovel_id in await db.execute(crud.cluster_members_select([c.cluster_id for c in clusters])):
+            members.setdefault(cluster_id, []).append(imovel_id)
+    return [{**cluster._mapping, "imovel_ids": members.get(cluster.cluster_id, [])} for cluster in clusters]
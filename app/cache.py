@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# redis://... para compartilhar o cache entre processos (requer o pacote `redis`)
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+
+GENERATION_KEY = "imoveis:generation"
+
+
+class MemoryBackend:
+    """LRU em memória com expiração por entrada."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisBackend:
+    """Backend para qualquer cliente compatível com Redis (redis-py, fakeredis...)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+    def counter(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+
+class ResponseCache:
+    """Cache de respostas serializadas das leituras de imóveis.
+
+    As chaves levam o contador de geração atual; cada escrita em `crud`
+    incrementa o contador (`bump_generation`) e as entradas antigas deixam
+    de ser encontradas, expirando pelo LRU/TTL. Cada entrada guarda o ETag
+    do corpo, para responder `If-None-Match` sem reserializar.
+    """
+
+    def __init__(self, backend, ttl: float = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def generation(self) -> int:
+        return self.backend.counter(GENERATION_KEY)
+
+    def bump_generation(self) -> int:
+        return self.backend.incr(GENERATION_KEY)
+
+    def _lookup(self, key: str) -> Tuple[str, Optional[Tuple[str, bytes]]]:
+        full_key = f"imoveis:{self.generation()}:{key}"
+        cached = self.backend.get(full_key)
+        if cached is None:
+            return full_key, None
+        etag, _, body = cached.partition(b"\n")
+        return full_key, (etag.decode("ascii"), body)
+
+    def _store(self, full_key: str, body: bytes) -> Tuple[str, bytes]:
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self.backend.set(full_key, etag.encode("ascii") + b"\n" + body, self.ttl)
+        return etag, body
+
+    def get_or_set(self, key: str, produce: Callable[[], bytes]) -> Tuple[str, bytes]:
+        """Retorna (etag, corpo) do cache, ou gera com `produce` e guarda."""
+        full_key, hit = self._lookup(key)
+        return hit or self._store(full_key, produce())
+
+    async def aget_or_set(self, key: str, produce: Callable[[], Awaitable[bytes]]) -> Tuple[str, bytes]:
+        """Como `get_or_set`, com `produce` assíncrono."""
+        full_key, hit = self._lookup(key)
+        return hit or self._store(full_key, await produce())
+
+
+def _make_backend():
+    if RESPONSE_CACHE_URL:
+        import redis
+        return RedisBackend(redis.Redis.from_url(RESPONSE_CACHE_URL))
+    return MemoryBackend()
+
+
+response_cache = ResponseCache(_make_backend())
+
+
+def bump_generation() -> None:
+    """Invalida as respostas em cache; chamado pelas escritas de imóveis."""
+    response_cache.bump_generation()
@@ -1,74 +1,387 @@
-from typing import Dict, List
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
-from app import models, schemas
+from sqlalchemy import case, literal, or_, func, select, tuple_, union_all
+from app import cache, database, dedup, metrics, models, schemas, search, stats, utils
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 500
+# Campos raspados de um imóvel, na ordem usada pelo hash de conteúdo
+VALUE_COLUMNS = list(schemas.ImovelCreate.model_fields)
+
+def imoveis_select(skip: int = 0, limit: int = 100):
+    return select(models.Imovel).order_by(models.Imovel.id).offset(skip).limit(limit)
 
 def get_imoveis(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Imovel).offset(skip).limit(limit).all()
+    return db.scalars(imoveis_select(skip, limit)).all()
+
+KEYSET_SORTS = ('id', 'preco')
+
+def keyset_select(
+    limit: int = 100,
+    after: Optional[list] = None,
+    sort: str = 'id',
+    descending: bool = False,
+    fields: Optional[List[str]] = None
+):
+    """SELECT de uma página ordenada por (`sort`, id), começando depois de `after`.
+
+    `after` são os valores de (`sort`, id) da última linha da página anterior
+    (ou só [id] quando `sort` é 'id'). Diferente de OFFSET, o custo não cresce
+    com a profundidade da página. Seleciona apenas `fields` mais as colunas
+    de ordenação. Compartilhado pelas versões síncrona e assíncrona.
+
+    Linhas com `sort` NULL (anúncios antigos sem preço) vêm por último nas
+    duas direções, ordenadas por id; o cursor de uma delas é [None, id].
+    """
+    if sort not in KEYSET_SORTS:
+        raise ValueError(f"Ordenação não suportada: {sort}")
+    key = [models.Imovel.id] if sort == 'id' else [getattr(models.Imovel, sort), models.Imovel.id]
+    columns = [getattr(models.Imovel, f) for f in (fields or []) if f not in ('id', sort)]
+    if after is not None and len(after) != len(key):
+        raise ValueError("Cursor não corresponde à ordenação")
+
+    def after_position(stmt, key, after):
+        position = tuple_(*key) if len(key) > 1 else key[0]
+        boundary = tuple_(*after) if len(key) > 1 else after[0]
+        return stmt.where(position < boundary if descending else position > boundary)
+
+    def ordered(stmt, key):
+        return stmt.order_by(*[c.desc() if descending else c.asc() for c in key]).limit(limit)
+
+    stmt = select(*key, *columns)
+    if sort == 'id':
+        return ordered(stmt if after is None else after_position(stmt, key, after), key)
+
+    # Um trecho para as linhas com valor e outro para as NULL, cada um pelo
+    # índice (sort, id); a comparação de tuplas não casa com NULL
+    sort_column, id_column = key
+    nulls = stmt.where(sort_column.is_(None))
+    if after is not None and after[0] is None:
+        return ordered(after_position(nulls, [id_column], after[1:]), [id_column])
+    valued = stmt.where(sort_column.is_not(None))
+    if after is not None:
+        valued = after_position(valued, key, after)
+    page = union_all(
+        select(ordered(valued, key).subquery(), literal(0).label('segment')),
+        select(ordered(nulls, [id_column]).subquery(), literal(1).label('segment')),
+    ).subquery()
+    page_key = [page.c[sort], page.c.id]
+    return ordered(select(*[page.c[c.key] for c in (*key, *columns)]).order_by(page.c.segment), page_key)
+
+def get_imoveis_keyset(
+    db: Session,
+    limit: int = 100,
+    after: Optional[list] = None,
+    sort: str = 'id',
+    descending: bool = False,
+    fields: Optional[List[str]] = None
+):
+    """Página de imóveis por cursor; ver `keyset_select`."""
+    return db.execute(keyset_select(limit, after, sort, descending, fields)).all()
+
+def listing_content_hash(data: Dict) -> str:
+    return utils.content_hash([data.get(c) for c in VALUE_COLUMNS])
+
+def _refresh_content_hash(db_imovel: models.Imovel):
+    db_imovel.content_hash = listing_content_hash({c: getattr(db_imovel, c) for c in VALUE_COLUMNS})
+
+def _reindex_duplicates(db: Session, db_imovel: models.Imovel, old_hash: Optional[str]):
+    """Recalcula o grupo de quase duplicados de um imóvel cujo conteúdo mudou."""
+    if db_imovel.content_hash != old_hash:
+        db.flush()
+        dedup.index_imovel(db, db_imovel)
+
+def _history_values(db_imovel: models.Imovel) -> Dict:
+    values = {c: getattr(db_imovel, c) for c in VALUE_COLUMNS}
+    values.update(listing_id=db_imovel.listing_id, cidade_norm=db_imovel.cidade_norm, tipo_norm=db_imovel.tipo_norm)
+    return values
+
+def _history_row(data: Dict, old: Optional[Dict] = None, observed_at: Optional[datetime] = None) -> Optional[Dict]:
+    """Linha de `imovel_history` para um anúncio novo (`old` None) ou alterado.
+
+    Retorna None se nada mudou. Além do preço, guarda só os campos alterados.
+    """
+    changes = None
+    if old is not None:
+        changes = {c: data[c] for c in VALUE_COLUMNS if c != 'preco' and old.get(c) != data.get(c)}
+        if not changes and old.get('preco') == data.get('preco'):
+            return None
+    return {
+        "listing_id": data['listing_id'],
+        "observed_at": observed_at or datetime.utcnow(),
+        "event": "new" if old is None else "changed",
+        "preco": data.get('preco'),
+        "preco_anterior": old.get('preco') if old is not None else None,
+        "changes": changes or None,
+        "cidade_norm": data.get('cidade_norm'),
+        "tipo_norm": data.get('tipo_norm'),
+    }
+
+def _append_history(db: Session, rows: List[Optional[Dict]]):
+    rows = [row for row in rows if row]
+    if rows:
+        db.execute(models.ImovelHistory.__table__.insert(), rows)
+
+def _apply_update(db: Session, db_imovel: models.Imovel, update_data: Dict) -> models.Imovel:
+    """Grava alterações em um imóvel e toda a contabilidade derivada.
+
+    Colunas de busca, `listing_id`, hash de conteúdo, grupo de duplicados,
+    rollups do /stats e histórico de preço; depois invalida o cache de respostas.
+    """
+    old = stats.snapshot(db_imovel)
+    old_values = _history_values(db_imovel)
+    old_hash = db_imovel.content_hash
+    update_data.update(search.normalized_values(update_data))
+    for key, value in update_data.items():
+        setattr(db_imovel, key, value)
+    if update_data.get('link'):
+        db_imovel.listing_id = utils.listing_identity(update_data['link'])
+    _refresh_content_hash(db_imovel)
+    _reindex_duplicates(db, db_imovel, old_hash)
+    deltas = stats.RollupDeltas()
+    deltas.changed(old, stats.snapshot(db_imovel))
+    deltas.apply(db)
+    _append_history(db, [_history_row(_history_values(db_imovel), old_values)])
+    db.commit()
+    cache.bump_generation()
+    db.refresh(db_imovel)
+    return db_imovel
 
 def create_imovel(db: Session, imovel: schemas.ImovelCreate):
-    db_imovel = models.Imovel(**imovel.model_dump())
+    data = imovel.model_dump()
+    db_imovel = models.Imovel(
+        **data,
+        **search.normalized_values(data),
+        listing_id=utils.listing_identity(imovel.link),
+        content_hash=listing_content_hash(data)
+    )
     db.add(db_imovel)
+    deltas = stats.RollupDeltas()
+    deltas.added(data)
+    deltas.apply(db)
+    db.flush()
+    dedup.index_imovel(db, db_imovel)
+    _append_history(db, [_history_row(_history_values(db_imovel))])
     db.commit()
+    cache.bump_generation()
     db.refresh(db_imovel)
     return db_imovel
 
+def get_imovel_by_listing_id(db: Session, listing_id: str):
+    return db.query(models.Imovel).filter(models.Imovel.listing_id == listing_id).first()
+
 def create_or_update_imovel(db: Session, imovel: schemas.ImovelCreate):
-    existing = db.query(models.Imovel).filter(
-        models.Imovel.cidade == imovel.cidade,
-        models.Imovel.bairro == imovel.bairro,
-        models.Imovel.titulo == imovel.titulo,
-        models.Imovel.num_quartos == imovel.num_quartos,
-        models.Imovel.num_vagas == imovel.num_vagas,
-        models.Imovel.num_banheiros == imovel.num_banheiros,
-        models.Imovel.tipo == imovel.tipo
-    ).first()
+    existing = get_imovel_by_listing_id(db, utils.listing_identity(imovel.link))
 
     if existing:
-        update_data = imovel.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(existing, key, value)
-        db.commit()
-        db.refresh(existing)
-        return existing
+        return _apply_update(db, existing, imovel.model_dump(exclude_unset=True))
     else:
         return create_imovel(db, imovel)
 
+def _prepare_rows(imoveis: Iterable[Dict], result: Optional[schemas.IngestResult] = None) -> Dict[str, Dict]:
+    """Valida imóveis raspados e os indexa por `listing_id`, com colunas derivadas."""
+    rows = {}
+    for imovel in imoveis:
+        if result is not None:
+            result.received += 1
+        try:
+            data = schemas.ImovelCreate(**imovel).model_dump()
+        except Exception as e:
+            if result is not None:
+                result.invalid += 1
+            logger.warning(f"Imóvel inválido ignorado: {e}")
+            continue
+        data['listing_id'] = utils.listing_identity(data['link'])
+        data['content_hash'] = listing_content_hash(data)
+        data.update(search.normalized_values(data))
+        rows[data['listing_id']] = data
+    return rows
+
+def _stored_hashes(db: Session, listing_ids: List[str]) -> Dict[str, Optional[str]]:
+    return dict(
+        db.query(models.Imovel.listing_id, models.Imovel.content_hash)
+        .filter(models.Imovel.listing_id.in_(listing_ids))
+    )
+
+def bulk_upsert_imoveis(db: Session, imoveis: Iterable[Dict]) -> schemas.IngestResult:
+    """Grava um lote de imóveis raspados com poucos INSERTs por lote.
+
+    Os registros são validados e deduplicados em memória pela identidade do
+    anúncio (`listing_id`). Anúncios cujo hash de conteúdo bate com o do
+    banco não são lidos nem reescritos. Os novos entram com ON CONFLICT DO
+    NOTHING ... RETURNING, e só o que esse INSERT gravou conta como novo; os
+    demais são relidos com SELECT ... FOR UPDATE antes do ajuste dos rollups
+    e do histórico. Assim, dois workers gravando o mesmo anúncio não contam
+    a mesma mudança duas vezes. Tudo ocorre em uma única transação.
+    """
+    started = time.perf_counter()
+    result = schemas.IngestResult()
+    rows = _prepare_rows(imoveis, result)
+
+    write_cols = VALUE_COLUMNS + ['content_hash'] + [f"{col}_norm" for col in search.SEARCH_COLUMNS]
+    insert = database.dialect_insert(db)
+    # Ordem fixa: os locks de linha de workers concorrentes saem sempre na mesma sequência
+    keys = sorted(rows)
+    try:
+        for i in range(0, len(keys), UPSERT_BATCH_SIZE):
+            batch = keys[i:i + UPSERT_BATCH_SIZE]
+            hashes = _stored_hashes(db, batch)
+            history = []
+            changed = []
+            deltas = stats.RollupDeltas()
+            now = datetime.utcnow()
+
+            def added(key: str):
+                result.inserted += 1
+                deltas.added(rows[key])
+                history.append(_history_row(rows[key], observed_at=now))
+                changed.append(key)
+
+            new = [key for key in batch if key not in hashes]
+            inserted = set()
+            if new:
+                stmt = insert(models.Imovel.__table__).values([rows[key] for key in new])
+                stmt = stmt.on_conflict_do_nothing(index_elements=['listing_id']).returning(models.Imovel.listing_id)
+                inserted = set(db.execute(stmt).scalars())
+                for key in new:
+                    if key in inserted:
+                        added(key)
+
+            # Hash diferente do lido, ou inserido por outro worker no meio tempo
+            stale = [key for key in batch if key not in inserted and hashes.get(key) != rows[key]['content_hash']]
+            result.unchanged += len(batch) - len(inserted) - len(stale)
+            to_write = []
+            if stale:
+                database.lock_for_write(db)
+                existing = {
+                    row[0]: (row[1], tuple(row[2:]))
+                    for row in db.execute(
+                        select(
+                            models.Imovel.listing_id, models.Imovel.content_hash,
+                            *[getattr(models.Imovel, c) for c in VALUE_COLUMNS]
+                        ).where(models.Imovel.listing_id.in_(stale))
+                        .order_by(models.Imovel.listing_id)
+                        .with_for_update()
+                    )
+                }
+                for key in stale:
+                    data = rows[key]
+                    if key not in existing:
+                        # Apagado entre o INSERT e a releitura
+                        added(key)
+                    else:
+                        stored_hash, values = existing[key]
+                        if stored_hash == data['content_hash']:
+                            result.unchanged += 1
+                            continue
+                        if values != tuple(data[c] for c in VALUE_COLUMNS):
+                            result.updated += 1
+                            old = dict(zip(VALUE_COLUMNS, values))
+                            deltas.changed(old, data)
+                            history.append(_history_row(data, old, observed_at=now))
+                            changed.append(key)
+                        else:
+                            # Linha anterior ao hash de conteúdo: só grava o hash
+                            result.unchanged += 1
+                    to_write.append(data)
+
+            if to_write:
+                stmt = insert(models.Imovel.__table__).values(to_write)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['listing_id'],
+                    set_={c: stmt.excluded[c] for c in write_cols}
+                )
+                db.execute(stmt)
+            if history:
+                deltas.apply(db)
+                _append_history(db, history)
+            if changed:
+                dedup.index_listings(db, [
+                    (imovel_id, rows[key], cluster_id)
+                    for imovel_id, key, cluster_id in db.query(
+                        models.Imovel.id, models.Imovel.listing_id, models.Imovel.cluster_id
+                    ).filter(models.Imovel.listing_id.in_(changed))
+                ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if result.inserted or result.updated:
+        cache.bump_generation()
+
+    result.elapsed = time.perf_counter() - started
+    metrics.SCRAPER_STAGE_SECONDS.observe(result.elapsed, stage="db_ingest")
+    for name in ('inserted', 'updated', 'unchanged', 'invalid'):
+        metrics.DB_UPSERTS.inc(getattr(result, name), result=name)
+    logger.info(
+        f"Ingestão: {result.inserted} novos, {result.updated} atualizados, "
+        f"{result.unchanged} inalterados, {result.invalid} inválidos "
+        f"({result.rows_per_second:.0f} linhas/s)"
+    )
+    return result
+
 def get_imovel_by_id(db: Session, imovel_id: int):
     return db.query(models.Imovel).filter(models.Imovel.id == imovel_id).first()
 
-def get_filtered_imoveis(db: Session, filter_params: Dict) -> List[models.Imovel]:
-    query = db.query(models.Imovel)
+def filter_imoveis_query(db: Session, filter_params: Dict, *entities, mode: str = 'contains'):
+    query = db.query(*(entities or (models.Imovel,)))
     for key, value in filter_params.items():
-        if hasattr(models.Imovel, key):
-            if key in ['cidade', 'bairro', 'tipo']:
-                query = query.filter(
-                    func.lower(getattr(models.Imovel, key)).like(f'%{value.lower()}%')
-                )
-            else:
-                query = query.filter(getattr(models.Imovel, key) == value)
-    return query.all()
+        if key in search.SEARCH_COLUMNS:
+            query = search.apply_text_filter(query, key, value, mode=mode)
+        elif hasattr(models.Imovel, key):
+            query = query.filter(getattr(models.Imovel, key) == value)
+    return query
+
+def get_filtered_imoveis(db: Session, filter_params: Dict) -> List[models.Imovel]:
+    return filter_imoveis_query(db, filter_params).all()
+
+def iter_filtered_imoveis(
+    db: Session, filter_params: Dict, columns: List[str], chunk_size: int = 1000, unique: bool = False
+):
+    """Percorre os imóveis filtrados em lotes, sem carregar o resultado inteiro.
+
+    Retorna tuplas com os valores de `columns`, lidas com cursor no servidor
+    quando o banco suporta. Com `unique`, traz um imóvel por grupo de quase
+    duplicados (ver app/dedup.py).
+    """
+    query = filter_imoveis_query(
+        db, filter_params, *[getattr(models.Imovel, c) for c in columns]
+    ).order_by(models.Imovel.id)
+    if unique:
+        query = query.filter(dedup.unique_filter())
+    return query.execution_options(stream_results=True).yield_per(chunk_size)
 
 def update_imovel(db: Session, imovel_id: int, imovel: schemas.ImovelUpdate):
     db_imovel = get_imovel_by_id(db, imovel_id)
     if db_imovel:
-        update_data = imovel.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_imovel, key, value)
-        db.commit()
-        db.refresh(db_imovel)
+        return _apply_update(db, db_imovel, imovel.model_dump(exclude_unset=True))
     return db_imovel
 
 def delete_all_imoveis(db: Session):
+    db.query(models.ScrapePageState).delete()
+    db.query(models.ImovelLshBucket).delete()
+    db.query(models.ImovelSignature).delete()
     db.query(models.Imovel).delete()
+    db.query(models.PriceRollup).delete()
     db.commit()
+    cache.bump_generation()
     return True
 
 def delete_imovel(db: Session, imovel_id: int):
     db_imovel = get_imovel_by_id(db, imovel_id)
     if db_imovel:
+        deltas = stats.RollupDeltas()
+        deltas.removed(stats.snapshot(db_imovel))
+        dedup.remove(db, [imovel_id])
         db.delete(db_imovel)
+        deltas.apply(db)
         db.commit()
+        cache.bump_generation()
         return True
     return False
 
@@ -77,18 +390,264 @@ def search_imoveis(
     cidade: str = None, 
     bairro: str = None, 
     preco_min: float = None, 
-    preco_max: float = None
+    preco_max: float = None,
+    mode: str = 'exact'
 ):
+    """Busca por cidade/bairro ignorando acentos e caixa (`mode`: exact, prefix ou contains)."""
     query = db.query(models.Imovel)
     if cidade:
-        query = query.filter(models.Imovel.cidade == cidade)
+        query = search.apply_text_filter(query, 'cidade', cidade, mode=mode)
     if bairro:
-        query = query.filter(models.Imovel.bairro == bairro)
+        query = search.apply_text_filter(query, 'bairro', bairro, mode=mode)
     if preco_min:
         query = query.filter(models.Imovel.preco >= preco_min)
     if preco_max:
         query = query.filter(models.Imovel.preco <= preco_max)
     return query.all()
 
+def total_imoveis_select():
+    return select(func.count()).select_from(models.Imovel)
+
 def get_total_imoveis(db: Session):
-    return db.query(models.Imovel).count()
+    return db.scalar(total_imoveis_select())
+
+def price_history_select(listing_id: str):
+    return (
+        select(models.ImovelHistory)
+        .where(models.ImovelHistory.listing_id == listing_id)
+        .order_by(models.ImovelHistory.observed_at, models.ImovelHistory.id)
+    )
+
+def price_changes_select(
+    limit: int = 100,
+    after: Optional[list] = None,
+    cidade: Optional[str] = None,
+    tipo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    drops_only: bool = False
+):
+    """Mudanças de preço de todo o mercado, da mais recente para a mais antiga.
+
+    Percorre o índice (observed_at, id), ou (cidade_norm, observed_at, id)
+    com `cidade`, a partir do cursor `after` = [observed_at, id] da última
+    linha da página anterior; não varre o histórico inteiro.
+    """
+    history = models.ImovelHistory
+    stmt = select(history).where(
+        history.event == "changed",
+        history.preco_anterior.is_not(None),
+        history.preco != history.preco_anterior
+    )
+    if drops_only:
+        stmt = stmt.where(history.preco < history.preco_anterior)
+    if cidade:
+        stmt = stmt.where(history.cidade_norm == utils.normalize_string(cidade))
+    if tipo:
+        stmt = stmt.where(history.tipo_norm == utils.normalize_string(tipo))
+    if since:
+        stmt = stmt.where(history.observed_at >= since)
+    if after is not None:
+        if len(after) != 2:
+            raise ValueError("Cursor inválido")
+        stmt = stmt.where(tuple_(history.observed_at, history.id) < tuple_(datetime.fromisoformat(after[0]), after[1]))
+    return stmt.order_by(history.observed_at.desc(), history.id.desc()).limit(limit)
+
+def duplicates_select(db_imovel: models.Imovel):
+    """Outros imóveis do mesmo grupo de quase duplicados."""
+    return (
+        select(models.Imovel)
+        .where(models.Imovel.cluster_id == db_imovel.cluster_id, models.Imovel.id != db_imovel.id)
+        .order_by(models.Imovel.id)
+    )
+
+def duplicate_clusters_select(
+    skip: int = 0,
+    limit: int = 100,
+    cidade: Optional[str] = None,
+    tipo: Optional[str] = None
+):
+    """Grupos com mais de um imóvel, dos maiores para os menores."""
+    size = func.count().label('size')
+    stmt = select(
+        models.Imovel.cluster_id,
+        size,
+        func.min(models.Imovel.preco).label('preco_min'),
+        func.max(models.Imovel.preco).label('preco_max')
+    ).where(models.Imovel.cluster_id.is_not(None))
+    if cidade:
+        stmt = stmt.where(models.Imovel.cidade_norm == utils.normalize_string(cidade))
+    if tipo:
+        stmt = stmt.where(models.Imovel.tipo_norm == utils.normalize_string(tipo))
+    return (
+        stmt.group_by(models.Imovel.cluster_id)
+        .having(func.count() > 1)
+        .order_by(size.desc(), models.Imovel.cluster_id)
+        .offset(skip)
+        .limit(limit)
+    )
+
+def cluster_members_select(cluster_ids: List[int]):
+    return (
+        select(models.Imovel.cluster_id, models.Imovel.id)
+        .where(models.Imovel.cluster_id.in_(cluster_ids))
+        .order_by(models.Imovel.id)
+    )
+
+def create_scrape_job(db: Session, job: schemas.ScrapeJobCreate, pages_per_task: int = 1) -> models.ScrapeJob:
+    db_job = models.ScrapeJob(**job.model_dump(), status="pending")
+    db.add(db_job)
+    db.flush()
+    end_page = job.start_page + job.max_pages
+    for page in range(job.start_page, end_page, pages_per_task):
+        db.add(models.ScrapeTask(
+            job_id=db_job.id,
+            start_page=page,
+            num_pages=min(pages_per_task, end_page - page)
+        ))
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_scrape_job(db: Session, job_id: int):
+    return db.query(models.ScrapeJob).filter(models.ScrapeJob.id == job_id).first()
+
+def claim_next_scrape_task(db: Session):
+    """Reserva a próxima tarefa pendente; retorna None se não houver nenhuma.
+
+    A reserva é um UPDATE condicional, então dois workers nunca pegam a
+    mesma tarefa mesmo sem lock de linha (SQLite).
+    """
+    now = datetime.utcnow()
+    candidates = db.query(models.ScrapeTask.id).filter(
+        models.ScrapeTask.status == "pending",
+        models.ScrapeTask.next_attempt_at <= now
+    ).order_by(models.ScrapeTask.job_id, models.ScrapeTask.start_page).limit(5).all()
+
+    for (task_id,) in candidates:
+        claimed = db.query(models.ScrapeTask).filter(
+            models.ScrapeTask.id == task_id,
+            models.ScrapeTask.status == "pending"
+        ).update({
+            models.ScrapeTask.status: "running",
+            models.ScrapeTask.attempts: models.ScrapeTask.attempts + 1
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            task = db.query(models.ScrapeTask).filter(models.ScrapeTask.id == task_id).first()
+            job = get_scrape_job(db, task.job_id)
+            if job.status == "pending":
+                job.status = "running"
+                db.commit()
+            return task
+    return None
+
+def _add_to_job(db: Session, job_id: int, **deltas: int):
+    """Soma aos contadores do job no próprio UPDATE.
+
+    Cada worker tem a sua sessão; ler, somar em Python e gravar perderia
+    os incrementos feitos por outro worker no meio tempo.
+    """
+    db.query(models.ScrapeJob).filter(models.ScrapeJob.id == job_id).update({
+        getattr(models.ScrapeJob, column): getattr(models.ScrapeJob, column) + delta
+        for column, delta in deltas.items()
+    }, synchronize_session=False)
+
+def record_scrape_progress(db: Session, task: models.ScrapeTask, listings_found: int):
+    """Soma os imóveis de uma página já gravada ao progresso da tarefa e do job."""
+    task.listings_found += listings_found
+    _add_to_job(db, task.job_id, listings_found=listings_found)
+    db.commit()
+
+def complete_scrape_task(db: Session, task: models.ScrapeTask, pages_done: Optional[int] = None):
+    """Conclui a tarefa; `pages_done` é menor que o intervalo quando um job incremental parou antes."""
+    task.status = "done"
+    task.error = None
+    _add_to_job(db, task.job_id, pages_done=task.num_pages if pages_done is None else pages_done)
+    db.commit()
+    job = get_scrape_job(db, task.job_id)
+    _finish_job_if_idle(db, job)
+
+def fail_scrape_task(db: Session, task: models.ScrapeTask, error: str, max_attempts: int, backoff: float):
+    task.error = error[:1000]
+    job = get_scrape_job(db, task.job_id)
+    job.last_error = task.error
+    if task.attempts >= max_attempts:
+        task.status = "failed"
+        _add_to_job(db, job.id, pages_failed=task.num_pages)
+    else:
+        # A nova tentativa refaz o intervalo inteiro; evita contar os imóveis duas vezes
+        _add_to_job(db, job.id, listings_found=-task.listings_found)
+        task.listings_found = 0
+        task.status = "pending"
+        task.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+    db.commit()
+    _finish_job_if_idle(db, job)
+
+def _page_fingerprint(rows: Dict[str, Dict]) -> str:
+    return utils.content_hash(sorted((key, data['content_hash']) for key, data in rows.items()))
+
+def is_page_unchanged(db: Session, job: models.ScrapeJob, page_number: int, imoveis: List[Dict]) -> bool:
+    """Indica se a página só traz anúncios já gravados e sem alteração.
+
+    Confere o hash de cada anúncio no banco, e não a impressão digital salva
+    da página: anúncios apagados ou editados depois do último crawl fazem a
+    página contar como nova.
+    """
+    rows = _prepare_rows(imoveis)
+    if not rows:
+        return False
+    hashes = _stored_hashes(db, list(rows))
+    return all(hashes.get(key) == data['content_hash'] for key, data in rows.items())
+
+def record_page_state(db: Session, job: models.ScrapeJob, page_number: int, imoveis: List[Dict]):
+    rows = _prepare_rows(imoveis)
+    values = {
+        "source": job.source,
+        "tipo": job.tipo,
+        "estado": job.estado,
+        "page_number": page_number,
+        "fingerprint": _page_fingerprint(rows),
+        "listing_ids": list(rows),
+        "updated_at": datetime.utcnow(),
+    }
+    insert = database.dialect_insert(db)
+    stmt = insert(models.ScrapePageState.__table__).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['source', 'tipo', 'estado', 'page_number'],
+        set_={c: stmt.excluded[c] for c in ('fingerprint', 'listing_ids', 'updated_at')}
+    )
+    db.execute(stmt)
+    db.commit()
+
+def stop_scrape_job(db: Session, job: models.ScrapeJob, page_number: int):
+    """Encerra um job incremental em `page_number`: as tarefas seguintes não rodam.
+
+    Com vários workers, vale a menor página de parada entre eles.
+    """
+    stopped_at = models.ScrapeJob.stopped_at_page
+    db.query(models.ScrapeJob).filter(models.ScrapeJob.id == job.id).update({
+        stopped_at: case((or_(stopped_at.is_(None), stopped_at > page_number), page_number), else_=stopped_at)
+    }, synchronize_session=False)
+    db.query(models.ScrapeTask).filter(
+        models.ScrapeTask.job_id == job.id,
+        models.ScrapeTask.status == "pending",
+        models.ScrapeTask.start_page > page_number
+    ).update({models.ScrapeTask.status: "skipped"}, synchronize_session=False)
+    db.commit()
+
+def _finish_job_if_idle(db: Session, job: models.ScrapeJob):
+    remaining = db.query(models.ScrapeTask).filter(
+        models.ScrapeTask.job_id == job.id,
+        models.ScrapeTask.status.in_(["pending", "running"])
+    ).count()
+    if remaining == 0:
+        job.status = "failed" if job.pages_done == 0 and job.pages_failed > 0 else "done"
+        db.commit()
+
+def requeue_running_scrape_tasks(db: Session) -> int:
+    """Devolve para a fila tarefas que ficaram 'running' após um restart."""
+    count = db.query(models.ScrapeTask).filter(
+        models.ScrapeTask.status == "running"
+    ).update({models.ScrapeTask.status: "pending"}, synchronize_session=False)
+    db.commit()
+    return count
@@ -0,0 +1,279 @@
+"""Detecção de anúncios quase duplicados (repostagens e outros portais) com MinHash/LSH.
+
+Cada imóvel vira um conjunto de atributos (palavras e pares de palavras
+do título, cidade, bairro, tipo, números e faixa de preço, normalizados
+com `utils.normalize_string`), resumido em uma assinatura MinHash de
+`NUM_PERM` valores. A assinatura é dividida em `BANDS` faixas; cada faixa
+vira uma linha indexada em `imovel_lsh_buckets`, e imóveis com alguma
+faixa igual são os candidatos. A busca é por índice, sem comparar o
+anúncio com a tabela inteira; cada faixa é guardada uma vez por grupo, o
+que limita os candidatos de anúncios muito repetidos.
+
+Candidatos com similaridade estimada a partir de `DEDUP_THRESHOLD`, do
+mesmo tipo, cidade e bairro e com preço a até `DEDUP_PRICE_TOLERANCE`
+entram no mesmo grupo, identificado pelo menor id (`Imovel.cluster_id`).
+Grupos só crescem ou se unem na ingestão; `rebuild` recalcula tudo do zero.
+"""
+import hashlib
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy import bindparam, func, or_, select
+from sqlalchemy.orm import Session
+from app import models, utils
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+DEDUP_PRICE_TOLERANCE = float(os.getenv("DEDUP_PRICE_TOLERANCE", "0.15"))
+# Faixas de preço de ~5%, cada imóvel marca a sua e a seguinte
+PRICE_STEP = math.log(1.05)
+# Candidatos considerados por faixa; limita faixas muito populares
+MAX_CANDIDATES_PER_BUCKET = 200
+LOOKUP_CHUNK_SIZE = 2000
+
+# Hashes universais (a * x + b) mod p, com p primo de Mersenne 2^31 - 1:
+# x tem 32 bits, então o produto cabe em uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, (1 << 31) - 1, size=(NUM_PERM, 1), dtype=np.uint64)
+_B = _rng.integers(0, (1 << 31) - 1, size=(NUM_PERM, 1), dtype=np.uint64)
+
+FEATURE_FIELDS = ('titulo', 'tipo', 'preco', 'cidade', 'bairro', 'num_quartos', 'num_vagas', 'num_banheiros')
+
+
+def features(data: Dict) -> Set[str]:
+    """Atributos normalizados de um imóvel que entram na assinatura."""
+    words = utils.normalize_string(data.get('titulo') or '').split()
+    tokens = {f"w:{word}" for word in words}
+    tokens.update(f"p:{a} {b}" for a, b in zip(words, words[1:]))
+    for field in ('cidade', 'bairro', 'tipo'):
+        tokens.add(f"{field}:{utils.normalize_string(data.get(field) or '')}")
+    for field in ('num_quartos', 'num_vagas', 'num_banheiros'):
+        tokens.add(f"{field}:{data.get(field) or 0}")
+    preco = data.get('preco') or 0
+    if preco > 0:
+        band = math.floor(math.log(preco) / PRICE_STEP)
+        tokens.update((f"preco:{band}", f"preco:{band + 1}"))
+    return tokens
+
+
+def signature(tokens: Iterable[str]) -> np.ndarray:
+    hashed = np.array(
+        [int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=4).digest(), 'little') for t in tokens],
+        dtype=np.uint64
+    )
+    return ((_A * hashed + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def buckets(sig: np.ndarray) -> List[int]:
+    """Chave de cada faixa da assinatura (inteiro de 64 bits com sinal, para o BigInteger)."""
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(band.to_bytes(2, 'little') + chunk.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Similaridade de Jaccard estimada entre duas assinaturas."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _place(tipo_norm: Optional[str], cidade_norm: Optional[str], bairro_norm: Optional[str]) -> Tuple[str, str, str]:
+    """Tipo, cidade e bairro normalizados, que precisam coincidir entre duplicados."""
+    return tipo_norm or '', cidade_norm or '', bairro_norm or ''
+
+
+def _is_duplicate(place: Tuple[str, str, str], preco: Optional[float], sig: np.ndarray, other: Tuple) -> bool:
+    other_sig, other_place, other_preco = other
+    # O local pesa pouco na assinatura: sem este filtro, o mesmo título e
+    # números em cidades ou bairros diferentes ficariam com similaridade alta.
+    # Um bairro vazio não casa com os demais, para não ligar grupos distintos
+    if place != other_place:
+        return False
+    if preco and other_preco and abs(preco - other_preco) > DEDUP_PRICE_TOLERANCE * max(preco, other_preco):
+        return False
+    return similarity(sig, other_sig) >= DEDUP_THRESHOLD
+
+
+def _candidate_ids(db: Session, keys: Sequence[int]) -> Dict[int, List[int]]:
+    found: Dict[int, List[int]] = {}
+    bucket = models.ImovelLshBucket
+    for i in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        rows = db.execute(
+            select(bucket.bucket, bucket.imovel_id)
+            .where(bucket.bucket.in_(keys[i:i + LOOKUP_CHUNK_SIZE]))
+            .order_by(bucket.imovel_id.desc())
+        )
+        for key, imovel_id in rows:
+            ids = found.setdefault(key, [])
+            if len(ids) < MAX_CANDIDATES_PER_BUCKET:
+                ids.append(imovel_id)
+    return found
+
+
+def _load_candidates(db: Session, ids: Iterable[int]) -> Dict[int, Tuple]:
+    """id -> ((assinatura, local, preço), cluster_id) dos candidatos já indexados."""
+    ids = list(ids)
+    loaded = {}
+    for i in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        rows = db.query(
+            models.ImovelSignature.imovel_id, models.ImovelSignature.signature,
+            models.Imovel.tipo_norm, models.Imovel.cidade_norm, models.Imovel.bairro_norm,
+            models.Imovel.preco, models.Imovel.cluster_id
+        ).join(models.Imovel, models.Imovel.id == models.ImovelSignature.imovel_id).filter(
+            models.ImovelSignature.imovel_id.in_(ids[i:i + LOOKUP_CHUNK_SIZE])
+        )
+        for imovel_id, sig, tipo_norm, cidade_norm, bairro_norm, preco, cluster_id in rows:
+            place = _place(tipo_norm, cidade_norm, bairro_norm)
+            loaded[imovel_id] = ((np.frombuffer(sig, dtype=np.uint32), place, preco), cluster_id or imovel_id)
+    return loaded
+
+
+def index_listings(db: Session, listings: Sequence[Tuple[int, Dict, Optional[int]]]) -> int:
+    """Indexa (id, valores, cluster_id atual) de imóveis novos ou alterados e os agrupa.
+
+    Os candidatos vêm do índice LSH e do próprio lote, em uma consulta por
+    lote. Um imóvel que casa com grupos diferentes os une no menor id.
+    Grava na sessão atual; o commit fica com quem chamou. Retorna quantos
+    imóveis entraram em um grupo com outros.
+    """
+    if not listings:
+        return 0
+    ids = [imovel_id for imovel_id, _, _ in listings]
+    remove(db, ids, relabel=False)
+
+    prepared = []
+    for imovel_id, data, cluster_id in listings:
+        sig = signature(features(data))
+        prepared.append((imovel_id, data, cluster_id, sig, buckets(sig)))
+    stored = _candidate_ids(db, [key for *_, keys in prepared for key in keys])
+    candidates = _load_candidates(db, {i for ids_ in stored.values() for i in ids_})
+
+    clusters: Dict[int, int] = {i: cluster for i, (_, cluster) in candidates.items()}
+    merged: Dict[int, int] = {}
+    batch_buckets: Dict[int, List[int]] = {}
+    # Grupos que já têm uma linha em cada faixa
+    bucket_groups: Dict[int, Set[int]] = {
+        key: {clusters[i] for i in owners if i in clusters} for key, owners in stored.items()
+    }
+    matched = 0
+
+    def resolve(cluster: int) -> int:
+        while cluster in merged:
+            cluster = merged[cluster]
+        return cluster
+
+    new_buckets = []
+    for imovel_id, data, cluster_id, sig, keys in prepared:
+        place = _place(*(utils.normalize_string(data.get(field) or '') for field in ('tipo', 'cidade', 'bairro')))
+        preco = data.get('preco')
+        found = set()
+        for key in keys:
+            found.update(stored.get(key, ()))
+            found.update(batch_buckets.get(key, ()))
+        found.discard(imovel_id)
+        groups = set()
+        for other in sorted(found & candidates.keys()):
+            group = resolve(clusters[other])
+            # Basta um membro parecido para entrar no grupo
+            if group not in groups and _is_duplicate(place, preco, sig, candidates[other][0]):
+                groups.add(group)
+        matched += bool(groups)
+        if cluster_id is not None:
+            groups.add(resolve(cluster_id))
+        target = min(groups | {imovel_id})
+        for group in groups - {target}:
+            merged[group] = target
+        clusters[imovel_id] = target
+        candidates[imovel_id] = ((sig, place, preco), target)
+        for key in keys:
+            # Uma linha por faixa e grupo: faixas populares não acumulam
+            # um candidato por anúncio repetido
+            groups_in_bucket = bucket_groups.setdefault(key, set())
+            if any(resolve(group) == target for group in groups_in_bucket):
+                continue
+            groups_in_bucket.add(target)
+            batch_buckets.setdefault(key, []).append(imovel_id)
+            new_buckets.append({"imovel_id": imovel_id, "bucket": key})
+
+    db.execute(models.ImovelSignature.__table__.insert(), [
+        {"imovel_id": imovel_id, "signature": sig.tobytes()} for imovel_id, _, _, sig, _ in prepared
+    ])
+    if new_buckets:
+        db.execute(models.ImovelLshBucket.__table__.insert(), new_buckets)
+    absorbed: Dict[int, List[int]] = {}
+    for old in merged:
+        absorbed.setdefault(resolve(old), []).append(old)
+    for target, olds in absorbed.items():
+        db.query(models.Imovel).filter(models.Imovel.cluster_id.in_(olds)).update(
+            {models.Imovel.cluster_id: target}, synchronize_session=False
+        )
+    db.execute(
+        models.Imovel.__table__.update().where(models.Imovel.id == bindparam('imovel_id')).values(
+            cluster_id=bindparam('cluster')
+        ),
+        [{"imovel_id": imovel_id, "cluster": resolve(clusters[imovel_id])} for imovel_id in ids]
+    )
+    return matched
+
+
+def listing_values(db_imovel: models.Imovel) -> Dict:
+    return {field: getattr(db_imovel, field) for field in FEATURE_FIELDS}
+
+
+def index_imovel(db: Session, db_imovel: models.Imovel) -> None:
+    """Indexa um imóvel da sessão (após o flush, para ter o id)."""
+    index_listings(db, [(db_imovel.id, listing_values(db_imovel), db_imovel.cluster_id)])
+    db.expire(db_imovel, ['cluster_id'])
+
+
+def remove(db: Session, imovel_ids: Sequence[int], relabel: bool = True) -> None:
+    """Tira imóveis do índice; com `relabel`, grupos que perdem o representante passam ao menor id restante."""
+    if not imovel_ids:
+        return
+    db.query(models.ImovelLshBucket).filter(models.ImovelLshBucket.imovel_id.in_(imovel_ids)).delete(
+        synchronize_session=False
+    )
+    db.query(models.ImovelSignature).filter(models.ImovelSignature.imovel_id.in_(imovel_ids)).delete(
+        synchronize_session=False
+    )
+    if not relabel:
+        return
+    for cluster_id in imovel_ids:
+        successor = db.query(func.min(models.Imovel.id)).filter(
+            models.Imovel.cluster_id == cluster_id, models.Imovel.id.notin_(imovel_ids)
+        ).scalar()
+        if successor is not None:
+            db.query(models.Imovel).filter(models.Imovel.cluster_id == cluster_id).update(
+                {models.Imovel.cluster_id: successor}, synchronize_session=False
+            )
+
+
+def rebuild(db: Session, chunk_size: int = 2000) -> int:
+    """Recalcula assinaturas, índice e grupos de todos os imóveis."""
+    db.query(models.ImovelLshBucket).delete()
+    db.query(models.ImovelSignature).delete()
+    db.query(models.Imovel).update({models.Imovel.cluster_id: None}, synchronize_session=False)
+    db.commit()
+    columns = [models.Imovel.id] + [getattr(models.Imovel, f) for f in FEATURE_FIELDS]
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.query(*columns).filter(models.Imovel.id > last_id).order_by(models.Imovel.id).limit(chunk_size).all()
+        if not rows:
+            break
+        index_listings(db, [(row[0], dict(zip(FEATURE_FIELDS, row[1:])), None) for row in rows])
+        db.commit()
+        last_id = rows[-1][0]
+        total += len(rows)
+    return total
+
+
+def unique_filter():
+    """Condição que mantém um imóvel por grupo (o representante) e os ainda sem grupo."""
+    return or_(models.Imovel.cluster_id.is_(None), models.Imovel.cluster_id == models.Imovel.id)
@@ -0,0 +1,99 @@
+import csv
+import io
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Sequence
+from openpyxl import Workbook
+
+EXPORT_COLUMNS = [
+    "id", "titulo", "tipo", "preco", "cidade", "bairro",
+    "num_quartos", "num_vagas", "num_banheiros", "link",
+]
+
+CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _stream_file(path: str) -> Iterator[bytes]:
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_BYTES):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def _temp_path(suffix: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def iter_csv(rows: Iterable[Sequence], columns: List[str], batch_size: int = 1000) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx(rows: Iterable[Sequence], columns: List[str]) -> Iterator[bytes]:
+    """Gera o xlsx em modo write-only (linhas vão direto para disco) e o devolve em blocos.
+
+    O formato é um zip, então o arquivo só pode ser enviado depois de fechado.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("imoveis")
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(list(row))
+    path = _temp_path(".xlsx")
+    workbook.save(path)
+    yield from _stream_file(path)
+
+
+def iter_parquet(rows: Iterable[Sequence], columns: List[str], batch_size: int = 10000) -> Iterator[bytes]:
+    """Escreve um row group por lote. Requer o pacote opcional `pyarrow`."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"id": pa.int64(), "preco": pa.float64(), "num_quartos": pa.int64(),
+             "num_vagas": pa.int64(), "num_banheiros": pa.int64()}
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+    path = _temp_path(".parquet")
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_arrays(list(map(list, zip(*batch))), schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_arrays(list(map(list, zip(*batch))), schema=schema))
+    yield from _stream_file(path)
+
+
+WRITERS = {
+    "csv": iter_csv,
+    "xlsx": iter_xlsx,
+    "parquet": iter_parquet,
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
@@ -0,0 +1,213 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+from app import crud, database
+from app.scrapers.base import BaseImovelScraper
+from app.scrapers.factory import ScraperFactory
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "2"))
+PAGES_PER_TASK = int(os.getenv("SCRAPE_PAGES_PER_TASK", "5"))
+MAX_ATTEMPTS = int(os.getenv("SCRAPE_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = float(os.getenv("SCRAPE_BACKOFF_BASE", "30"))
+POLL_INTERVAL = float(os.getenv("SCRAPE_POLL_INTERVAL", "2"))
+# Fontes cujos navegadores são abertos quando os workers sobem; vazio desativa
+WARM_UP_SOURCES = [s for s in os.getenv("SCRAPER_WARM_UP", "olx").split(",") if s]
+# Perfis dos jobs criados com profile=true; "pyinstrument" requer o pacote
+PROFILE_DIR = os.getenv("SCRAPE_PROFILE_DIR", "./profiles")
+PROFILER = os.getenv("SCRAPE_PROFILER", "cprofile")
+
+
+@contextmanager
+def profiled(name: str):
+    """Perfila o bloco na thread atual e grava em `PROFILE_DIR/<name>.prof` (ou .html).
+
+    Cobre o download e a ingestão coordenados pela thread do worker; o parse
+    roda em outros processos e aparece só como espera.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if PROFILER == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = os.path.join(PROFILE_DIR, f"{name}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            logger.info(f"Perfil gravado em {path}")
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Só um cProfile pode estar ativo por vez no processo
+        logger.warning(f"Outro perfil já está ativo; {name} roda sem perfil")
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(PROFILE_DIR, f"{name}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Perfil gravado em {path}")
+
+
+class ScrapeWorkerPool:
+    """Workers em threads que consomem as tarefas de scraping persistidas no banco.
+
+    Cada tarefa cobre um intervalo de páginas de um job. Falhas voltam para a
+    fila com backoff exponencial até `max_attempts`; tarefas que estavam em
+    andamento quando a API caiu são reenfileiradas no `start()`.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_attempts: Optional[int] = None):
+        self.workers = workers or SCRAPE_WORKERS
+        self.max_attempts = max_attempts or MAX_ATTEMPTS
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        db = database.WriterSessionLocal()
+        try:
+            requeued = crud.requeue_running_scrape_tasks(db)
+        finally:
+            db.close()
+        if requeued:
+            logger.info(f"{requeued} tarefas de scraping reenfileiradas")
+
+        self._stop.clear()
+        if WARM_UP_SOURCES:
+            # Em segundo plano, para não atrasar a subida da API
+            threading.Thread(target=self._warm_up, name="scrape-warm-up", daemon=True).start()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"scrape-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _warm_up(self) -> None:
+        for source in WARM_UP_SOURCES:
+            try:
+                scraper = ScraperFactory.get_scraper(source)
+                try:
+                    scraper.warm_up()
+                finally:
+                    scraper.close()
+                logger.info(f"Navegadores de {source} prontos")
+            except Exception as e:
+                logger.warning(f"Não foi possível aquecer o scraper {source}: {e}")
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Acorda os workers ociosos quando um job novo é criado."""
+        self._wakeup.set()
+
+    def _backoff(self, attempts: int) -> float:
+        return BACKOFF_BASE * (2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+
+    def _run(self) -> None:
+        # Um scraper por fonte em cada worker, mantido entre as tarefas para
+        # não reabrir navegadores e conexões a cada intervalo de páginas
+        scrapers: Dict[str, BaseImovelScraper] = {}
+        try:
+            while not self._stop.is_set():
+                db = database.WriterSessionLocal()
+                try:
+                    task = crud.claim_next_scrape_task(db)
+                    if task is None:
+                        db.close()
+                        self._wakeup.wait(POLL_INTERVAL)
+                        self._wakeup.clear()
+                        continue
+                    self._process(db, task, scrapers)
+                except Exception as e:
+                    logger.exception(f"Erro no worker de scraping: {e}")
+                finally:
+                    db.close()
+        finally:
+            for scraper in scrapers.values():
+                scraper.close()
+
+    def _scraper(self, scrapers: Dict[str, BaseImovelScraper], source: str) -> BaseImovelScraper:
+        scraper = scrapers.get(source)
+        if scraper is None:
+            scraper = ScraperFactory.get_scraper(source)
+            scraper.close_after_crawl = False
+            scrapers[source] = scraper
+        return scraper
+
+    def _process(self, db, task, scrapers: Dict[str, BaseImovelScraper]) -> None:
+        job = crud.get_scrape_job(db, task.job_id)
+        logger.info(f"Job {job.id}: páginas {task.start_page}-{task.start_page + task.num_pages - 1} (tentativa {task.attempts})")
+        try:
+            scraper = self._scraper(scrapers, job.source)
+            # Cada página é gravada assim que fica pronta; uma falha no meio
+            # do intervalo não descarta o que já foi salvo
+            pages = scraper.iter_pages(
+                tipo=job.tipo,
+                estado=job.estado,
+                start_page=task.start_page,
+                max_pages=task.num_pages
+            )
+            profile = profiled(f"job-{job.id}-task-{task.id}") if job.profile else nullcontext()
+            try:
+                with profile:
+                    pages_done = self._ingest_pages(db, job, task, pages)
+            finally:
+                pages.close()
+        except Exception as e:
+            logger.exception(f"Job {job.id}: erro ao processar páginas a partir de {task.start_page}: {e}")
+            crud.fail_scrape_task(db, task, str(e), self.max_attempts, self._backoff(task.attempts))
+            # A próxima tentativa começa com um scraper novo
+            failed = scrapers.pop(job.source, None)
+            if failed is not None:
+                failed.close()
+            return
+        crud.complete_scrape_task(db, task, pages_done)
+
+
+    def _ingest_pages(self, db, job, task, pages) -> int:
+        """Grava as páginas da tarefa e retorna quantas foram processadas.
+
+        As páginas chegam fora de ordem; no modo incremental, uma página sem
+        novidades encerra o job, mas as anteriores a ela ainda são gravadas.
+        """
+        waiting = set(range(task.start_page, task.start_page + task.num_pages))
+        stop_at = None
+        processed = 0
+        for page_number, imoveis in pages:
+            waiting.discard(page_number)
+            if stop_at is None or page_number < stop_at:
+                processed += 1
+                if job.incremental and crud.is_page_unchanged(db, job, page_number, imoveis):
+                    logger.info(f"Job {job.id}: página {page_number} sem novidades, encerrando o crawl")
+                    stop_at = page_number
+                    crud.stop_scrape_job(db, job, page_number)
+                else:
+                    result = crud.bulk_upsert_imoveis(db, imoveis)
+                    if job.incremental:
+                        crud.record_page_state(db, job, page_number, imoveis)
+                    crud.record_scrape_progress(db, task, result.received - result.invalid)
+            if stop_at is not None and not any(n < stop_at for n in waiting):
+                break
+        return processed
+
+
+worker_pool = ScrapeWorkerPool()
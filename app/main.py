@@ -1,13 +1,19 @@
-import os
+import json
+import time
+from datetime import datetime
 from typing import Optional
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, APIRouter, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app import crud, models, schemas, database, utils
+from app import async_crud, cache, crud, exporters, jobs, metrics, models, schemas, search, stats, database, utils
+from app.scrapers import pipeline
 from app.scrapers.factory import ScraperFactory
 import logging
 
 models.Base.metadata.create_all(bind=database.engine)
+search.setup_fulltext(database.engine)
 
 logging.basicConfig(level=logging.INFO)
 
@@ -21,6 +27,24 @@ app = FastAPI(
 
 router = APIRouter()
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code
+    )
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    """Métricas da API e do scraper no formato de texto do Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 def get_db():
     db = database.SessionLocal()
     try:
@@ -32,21 +56,220 @@ def get_db():
 def create_imovel(imovel: schemas.ImovelCreate, db: Session = Depends(get_db)):
     return crud.create_imovel(db=db, imovel=imovel)
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def _cached_json(request: Request, key: str, produce) -> Response:
+    """Resposta JSON vinda do cache de respostas, com ETag e 304 para `If-None-Match`.
+
+    `produce` (assíncrono) só roda, e consulta o banco, quando a chave não
+    está em cache para a geração atual; erros como 404 não são guardados.
+    """
+    async def serialize() -> bytes:
+        return json.dumps(jsonable_encoder(await produce()), ensure_ascii=False).encode("utf-8")
+
+    etag, body = await cache.response_cache.aget_or_set(key, serialize)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
 @app.get("/imoveis/total", response_model=int)
-def total_imoveis(db: Session = Depends(get_db)):
-    return crud.get_total_imoveis(db)
+async def total_imoveis(request: Request, db: AsyncSession = Depends(database.get_async_db)):
+    return await _cached_json(request, "total", lambda: async_crud.get_total_imoveis(db))
 
 @app.get("/imoveis/", response_model=list[schemas.Imovel])
-def read_imoveis(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    imoveis = crud.get_imoveis(db=db, skip=skip, limit=limit)
-    return imoveis
+async def read_imoveis(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Listagem paginada por OFFSET. Para percorrer tabelas grandes use
+    `/imoveis/page` (cursor) ou `/imoveis/stream` (NDJSON).
+    """
+    async def produce():
+        imoveis = await async_crud.get_imoveis(db, skip=skip, limit=limit)
+        return [schemas.Imovel.model_validate(i) for i in imoveis]
+
+    return await _cached_json(request, f"list:{skip}:{limit}", produce)
+
+def _parse_fields(fields: Optional[str]) -> list[str]:
+    if not fields:
+        return list(schemas.Imovel.model_fields)
+    selected = [f.strip() for f in fields.split(',') if f.strip()]
+    invalid = [f for f in selected if f not in schemas.Imovel.model_fields]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(invalid)}")
+    return selected
+
+def _parse_sort(sort: str) -> tuple[str, bool]:
+    descending = sort.startswith('-')
+    column = sort.lstrip('-')
+    if column not in crud.KEYSET_SORTS:
+        raise HTTPException(status_code=400, detail=f"Ordenação não suportada: {sort}")
+    return column, descending
+
+def _page_from_rows(rows, column: str, limit: int, fields: list[str]):
+    items = [{f: row._mapping[f] for f in fields} for row in rows]
+    last = None
+    if len(rows) == limit:
+        last = [rows[-1].id] if column == 'id' else [getattr(rows[-1], column), rows[-1].id]
+    return items, last
+
+def _keyset_page(db: Session, sort: str, after: Optional[list], limit: int, fields: list[str]):
+    column, descending = _parse_sort(sort)
+    try:
+        rows = crud.get_imoveis_keyset(db, limit=limit, after=after, sort=column, descending=descending, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page_from_rows(rows, column, limit, fields)
+
+@app.get("/imoveis/page", response_model=schemas.ImovelPage)
+async def read_imoveis_page(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Valor de `next_cursor` da página anterior."),
+    sort: str = Query("id", description="'id', 'preco' ou '-preco' para ordem decrescente."),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (ex: 'id,preco,cidade')."),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Listagem paginada por cursor (keyset): o custo de cada página não depende
+    da profundidade, ao contrário de `skip`.
+    """
+    after = None
+    if cursor:
+        try:
+            cursor_sort, *after = utils.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if cursor_sort != sort:
+            raise HTTPException(status_code=400, detail="Cursor gerado com outra ordenação")
+    column, descending = _parse_sort(sort)
+    selected = _parse_fields(fields)
+    try:
+        rows = await async_crud.get_imoveis_keyset(
+            db, limit=limit, after=after, sort=column, descending=descending, fields=selected
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items, last = _page_from_rows(rows, column, limit, selected)
+    next_cursor = utils.encode_cursor([sort, *last]) if last else None
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/imoveis/stream")
+def stream_imoveis(
+    sort: str = Query("id", description="'id', 'preco' ou '-preco' para ordem decrescente."),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (ex: 'id,preco,cidade')."),
+    chunk_size: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Envia todos os imóveis como NDJSON (um objeto JSON por linha), lendo o
+    banco em páginas por cursor.
+    """
+    selected = _parse_fields(fields)
+    _parse_sort(sort)
+
+    def iter_lines():
+        stream_db = database.SessionLocal()
+        try:
+            after = None
+            while True:
+                items, after = _keyset_page(stream_db, sort, after, chunk_size, selected)
+                if items:
+                    yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+                if after is None:
+                    break
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(iter_lines(), media_type="application/x-ndjson")
 
 @app.get("/imoveis/{imovel_id}", response_model=schemas.Imovel)
-def read_imovel(imovel_id: int, db: Session = Depends(get_db)):
-    imovel = crud.get_imovel_by_id(db, imovel_id)
+async def read_imovel(imovel_id: int, request: Request, db: AsyncSession = Depends(database.get_async_db)):
+    async def produce():
+        imovel = await async_crud.get_imovel_by_id(db, imovel_id)
+        if imovel is None:
+            raise HTTPException(status_code=404, detail="Imóvel não encontrado")
+        return schemas.Imovel.model_validate(imovel)
+
+    return await _cached_json(request, f"id:{imovel_id}", produce)
+
+@app.get("/imoveis/{imovel_id}/historico", response_model=schemas.PriceHistory)
+async def read_imovel_history(imovel_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Série de preços do anúncio: quando apareceu e cada mudança de preço ou
+    atributos desde então.
+    """
+    imovel = await async_crud.get_imovel_by_id(db, imovel_id)
+    if imovel is None:
+        raise HTTPException(status_code=404, detail="Imóvel não encontrado")
+    points = await async_crud.get_price_history(db, imovel.listing_id)
+    first_seen = next((p.observed_at for p in points if p.event == "new"), None)
+    return {"listing_id": imovel.listing_id, "first_seen": first_seen, "points": points}
+
+@app.get("/historico/precos", response_model=schemas.PriceChangePage)
+async def read_price_changes(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Valor de `next_cursor` da página anterior."),
+    cidade: Optional[str] = Query(None, description="Cidade dos imóveis."),
+    tipo: Optional[str] = Query(None, description="Tipo de imóvel (ex: 'venda', 'aluguel')."),
+    since: Optional[datetime] = Query(None, description="Só mudanças a partir desta data (ISO 8601)."),
+    apenas_reducoes: bool = Query(False, description="Só reduções de preço."),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Feed de mudanças de preço de todo o mercado, da mais recente para a mais
+    antiga, paginado por cursor.
+    """
+    after = None
+    if cursor:
+        try:
+            after = utils.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        items = await async_crud.get_price_changes(
+            db, limit=limit, after=after, cidade=cidade, tipo=tipo, since=since, drops_only=apenas_reducoes
+        )
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = utils.encode_cursor([items[-1].observed_at.isoformat(), items[-1].id])
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/imoveis/{imovel_id}/duplicados", response_model=list[schemas.Imovel])
+async def read_imovel_duplicates(imovel_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Outros anúncios do mesmo imóvel: repostagens ou o mesmo imóvel em outro
+    portal, com título ou preço um pouco diferentes.
+    """
+    imovel = await async_crud.get_imovel_by_id(db, imovel_id)
     if imovel is None:
         raise HTTPException(status_code=404, detail="Imóvel não encontrado")
-    return imovel
+    if imovel.cluster_id is None:
+        return []
+    return await async_crud.get_duplicates(db, imovel)
+
+@app.get("/duplicados", response_model=list[schemas.DuplicateCluster])
+async def read_duplicate_clusters(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cidade: Optional[str] = Query(None, description="Cidade dos imóveis."),
+    tipo: Optional[str] = Query(None, description="Tipo de imóvel (ex: 'venda', 'aluguel')."),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Grupos de anúncios quase duplicados, dos maiores para os menores. O
+    `cluster_id` é o id do anúncio mais antigo do grupo.
+    """
+    return await async_crud.get_duplicate_clusters(db, skip=skip, limit=limit, cidade=cidade, tipo=tipo)
 
 @app.put("/imoveis/{imovel_id}", response_model=schemas.Imovel,include_in_schema=False)
 def update_imovel(imovel_id: int, imovel: schemas.ImovelUpdate, db: Session = Depends(get_db)):
@@ -69,54 +292,136 @@ def delete_all_imoveis(db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Nenhum imóvel encontrado")
     return {"message": "Todos os imóveis foram deletados"}
 
+@app.on_event("startup")
+def start_scrape_workers():
+    jobs.worker_pool.start()
+
+@app.on_event("shutdown")
+def stop_scrape_workers():
+    jobs.worker_pool.stop()
+    pipeline.shutdown_parse_pool()
+
 @app.post("/scrape/{source}", response_model=dict, include_in_schema=False)
-async def scrape_and_save(
+def scrape_and_save(
     source: str,
     tipo: str,
     estado: str,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    start_page: int = 1,
-    max_pages: int = 10
+    start_page: int = Query(1, ge=1),
+    max_pages: int = Query(10, ge=1),
+    incremental: bool = False,
+    profile: bool = False
 ):
     """
-    Endpoint para iniciar o scraping e salvar os resultados no banco de dados.
+    Endpoint para criar um job de scraping processado pelos workers em background.
 
-    - **source**: Fonte do scraping (ex: 'olx')
+    - **source**: Fonte do scraping (ex: 'olx'); várias separadas por vírgula, ou 'todas',
+      criam um job por fonte, processados em paralelo pelos mesmos workers
     - **tipo**: Tipo de imóvel (ex: 'venda', 'aluguel')
     - **estado**: Estado do imóvel (ex: 'sp')
     - **start_page**: Página inicial para iniciar o scraping
     - **max_pages**: Número máximo de páginas para scraping
+    - **incremental**: Para na primeira página em que todos os anúncios já são conhecidos e inalterados
+    - **profile**: Grava um perfil de execução de cada tarefa do job (ver `SCRAPE_PROFILE_DIR`)
     """
-    def process_scraping():
-        try:
-            scraper = ScraperFactory.get_scraper(source)
-            imoveis = scraper.scrape_imoveis(tipo=tipo, estado=estado, start_page=start_page, max_pages=max_pages)
-            for imovel in imoveis:
-                try:
-                    crud.create_or_update_imovel(db=db, imovel=schemas.ImovelCreate(**imovel))
-                except Exception as e:
-                    logger.exception(f"Erro ao salvar imóvel: {e}")
-        except Exception as e:
-            logger.exception(f"Erro ao processar scraping: {e}")
-
-    background_tasks.add_task(process_scraping)
-    return {"message": "Scraping iniciado em background"}
-
-@app.post("/export/excel", response_model=dict)
-def export_imoveis_to_excel(
+    if source.lower() == "todas":
+        sources = ScraperFactory.sources()
+    else:
+        sources = list(dict.fromkeys(s.strip().lower() for s in source.split(",") if s.strip()))
+    unknown = [s for s in sources if not ScraperFactory.is_registered(s)]
+    if unknown or not sources:
+        raise HTTPException(status_code=404, detail=f"Scraper não encontrado para: {', '.join(unknown) or source}")
+
+    job_ids = [
+        crud.create_scrape_job(
+            db,
+            schemas.ScrapeJobCreate(
+                source=name,
+                tipo=tipo,
+                estado=estado,
+                start_page=start_page,
+                max_pages=max_pages,
+                incremental=incremental,
+                profile=profile
+            ),
+            pages_per_task=jobs.PAGES_PER_TASK
+        ).id
+        for name in sources
+    ]
+    jobs.worker_pool.notify()
+    return {"message": "Scraping iniciado em background", "job_id": job_ids[0], "job_ids": job_ids}
+
+@app.get("/scrape/sources", response_model=list[str], include_in_schema=False)
+def list_scrape_sources():
+    """Fontes de scraping registradas (embutidas e de plugins)."""
+    return ScraperFactory.sources()
+
+@app.get("/scrape/jobs/{job_id}", response_model=schemas.ScrapeJob, include_in_schema=False)
+async def read_scrape_job(job_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    job = await async_crud.get_scrape_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+@app.get("/stats", response_model=list[schemas.PriceStats])
+def read_price_stats(
+    group_by: str = Query("cidade", description="Agrupamento separado por vírgula: cidade, bairro, tipo, num_quartos."),
     cidade: Optional[str] = Query(None, description="Cidade dos imóveis."),
     bairro: Optional[str] = Query(None, description="Bairro dos imóveis."),
     tipo: Optional[str] = Query(None, description="Tipo de imóvel (ex: 'venda', 'aluguel')."),
-    db: Session = Depends(database.get_db)
+    num_quartos: Optional[int] = Query(None, ge=0, description="Número de quartos."),
+    percentiles: str = Query("25,75,90", description="Percentis separados por vírgula."),
+    limit: int = Query(100, ge=1, le=10000),
+    db: Session = Depends(get_db)
 ):
     """
-    Endpoint para exportar dados de imóveis para um arquivo Excel com base em filtros.
+    Estatísticas de preço (contagem, mínimo, máximo, média, mediana e
+    percentis aproximados) por grupo, calculadas a partir dos rollups
+    mantidos na ingestão.
+    """
+    groups = [g.strip() for g in group_by.split(',') if g.strip()]
+    invalid = [g for g in groups if g not in stats.STATS_GROUPS]
+    if not groups or invalid:
+        raise HTTPException(status_code=400, detail=f"Agrupamento inválido: {group_by}")
+    try:
+        requested = [float(p) for p in percentiles.split(',') if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Percentis inválidos: {percentiles}")
+    if any(not 0 <= p <= 100 for p in requested):
+        raise HTTPException(status_code=400, detail=f"Percentis inválidos: {percentiles}")
+
+    filters = {
+        key: value for key, value in
+        {'cidade': cidade, 'bairro': bairro, 'tipo': tipo, 'num_quartos': num_quartos}.items()
+        if value is not None
+    }
+    return stats.price_stats(db, groups, filters, requested, limit)
 
+@app.post("/export/{formato}")
+def export_imoveis(
+    formato: str,
+    cidade: Optional[str] = Query(None, description="Cidade dos imóveis."),
+    bairro: Optional[str] = Query(None, description="Bairro dos imóveis."),
+    tipo: Optional[str] = Query(None, description="Tipo de imóvel (ex: 'venda', 'aluguel')."),
+    sem_duplicados: bool = Query(False, description="Um anúncio por grupo de quase duplicados."),
+    db: Session = Depends(get_db)
+):
+    """
+    Endpoint para exportar dados de imóveis com base em filtros. O arquivo é
+    gerado e enviado em partes, sem carregar todos os imóveis em memória.
+
+    - **formato**: 'excel'/'xlsx', 'csv' ou 'parquet' (requer pyarrow).
     - **cidade**: (Opcional) Cidade dos imóveis.
     - **bairro**: (Opcional) Bairro dos imóveis.
     - **tipo**: (Opcional) Tipo de imóvel (ex: 'venda', 'aluguel').
+    - **sem_duplicados**: (Opcional) Exporta só o anúncio mais antigo de cada grupo de quase duplicados.
     """
+    formato = "xlsx" if formato == "excel" else formato
+    if formato not in exporters.WRITERS:
+        raise HTTPException(status_code=404, detail=f"Formato não suportado: {formato}")
+    if formato == "parquet" and not exporters.parquet_available():
+        raise HTTPException(status_code=501, detail="Exportação parquet requer o pacote pyarrow.")
+
     # Definir os parâmetros de filtro
     filter_params = {}
     if cidade:
@@ -126,23 +431,27 @@ def export_imoveis_to_excel(
     if tipo:
         filter_params['tipo'] = utils.normalize_string(tipo)
 
-    # Obter os imóveis filtrados do banco de dados
-    imoveis = crud.get_filtered_imoveis(db, filter_params)
-
-    if not imoveis:
+    if crud.filter_imoveis_query(db, filter_params, models.Imovel.id).first() is None:
         raise HTTPException(status_code=404, detail="Nenhum imóvel encontrado com os filtros fornecidos.")
 
-    # Exportar para Excel
-    try:
-        resultado = utils.export_to_excel(
-            data=[{k: v for k, v in imovel.__dict__.items() if not k.startswith('_')} 
-                for imovel in imoveis],
-            filter_params=filter_params
-        )
-        return FileResponse(
-            path=resultado,
-            filename=os.path.basename(resultado),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    def iter_rows():
+        # Sessão própria: a do request é fechada antes do fim do streaming
+        export_db = database.SessionLocal()
+        try:
+            yield from crud.iter_filtered_imoveis(
+                export_db, filter_params, exporters.EXPORT_COLUMNS, unique=sem_duplicados
+            )
+        finally:
+            export_db.close()
+
+    nome_arquivo = "imoveis"
+    if filter_params:
+        partes = [f"{key}_{value.replace(' ', '_')}" for key, value in filter_params.items()]
+        nome_arquivo += "_" + "_".join(partes)
+    nome_arquivo += f".{formato}"
+
+    return StreamingResponse(
+        exporters.WRITERS[formato](iter_rows(), exporters.EXPORT_COLUMNS),
+        media_type=exporters.MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'}
+    )
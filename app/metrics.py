@@ -0,0 +1,124 @@
+"""Métricas em memória no formato de texto do Prometheus, expostas em `/metrics`.
+
+Contadores e histogramas com labels, seguros entre threads e sem
+dependências externas. Valores medidos nos processos de parse são
+devolvidos ao processo principal e registrados aqui (ver pipeline.py).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Segundos; cobre de uma extração de card (sub-ms) até um navegador subindo
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(n, "") for n in self.labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label -> (contagem por bucket, soma, total)
+        self._values: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = _format_labels(self.labels, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+SCRAPER_STAGE_SECONDS = Histogram(
+    "scraper_stage_seconds",
+    "Duração de cada etapa do scraper: driver_startup, page_load (Selenium), http_fetch, "
+    "parse (página inteira), extract_card (parse / cards da página) e db_ingest.",
+    labels=("stage",),
+)
+SCRAPER_PAGES = Counter("scraper_pages_total", "Páginas processadas por resultado.", labels=("source", "status"))
+SCRAPER_CARDS = Counter("scraper_cards_total", "Imóveis extraídos das páginas.", labels=("source",))
+SCRAPER_EXTRACTION_FAILURES = Counter(
+    "scraper_extraction_failures_total", "Cards que falharam na extração.", labels=("source",)
+)
+DB_UPSERTS = Counter("db_upserts_total", "Imóveis recebidos pela ingestão, por resultado.", labels=("result",))
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Latência das requisições da API por rota.", labels=("method", "route", "status")
+)
+
+REGISTRY = [
+    SCRAPER_STAGE_SECONDS,
+    SCRAPER_PAGES,
+    SCRAPER_CARDS,
+    SCRAPER_EXTRACTION_FAILURES,
+    DB_UPSERTS,
+    HTTP_REQUEST_SECONDS,
+]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,13 +1,182 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-#from app.database import SQLALCHEMY_DATABASE_URL
+from sqlalchemy import inspect, text
+from app.database import SessionLocal, engine
 
-engine = create_engine("sqlite:///./imoveis.db", connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(engine).get_columns(table)}
 
 def add_tipo_column():
-    with engine.connect() as connection:
+    if _has_column("imoveis", "tipo"):
+        return
+    with engine.begin() as connection:
         connection.execute(text("ALTER TABLE imoveis ADD COLUMN tipo STRING"))
 
+def add_listing_id_column(batch_size: int = 5000):
+    """Cria a coluna `listing_id`, preenche a partir do link e a torna única.
+
+    Quando mais de uma linha resolve para o mesmo anúncio, mantém a mais recente.
+    """
+    from app.utils import listing_identity
+
+    if not _has_column("imoveis", "listing_id"):
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE imoveis ADD COLUMN listing_id VARCHAR"))
+
+    with engine.begin() as connection:
+        last_id = 0
+        while True:
+            rows = connection.execute(text(
+                "SELECT id, link FROM imoveis WHERE listing_id IS NULL AND id > :last_id "
+                "ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            connection.execute(
+                text("UPDATE imoveis SET listing_id = :listing_id WHERE id = :id"),
+                [{"id": row.id, "listing_id": listing_identity(row.link or str(row.id))} for row in rows]
+            )
+            last_id = rows[-1].id
+
+        connection.execute(text(
+            "DELETE FROM imoveis WHERE id NOT IN (SELECT MAX(id) FROM imoveis GROUP BY listing_id)"
+        ))
+        connection.execute(text("DROP INDEX IF EXISTS uq_imoveis_natural_key"))
+        connection.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_imoveis_listing_id ON imoveis (listing_id)"
+        ))
+
+def add_keyset_indexes():
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_imoveis_preco_id ON imoveis (preco, id)"
+        ))
+
+def add_search_columns(batch_size: int = 5000):
+    """Cria e preenche as colunas `_norm` de busca, seus índices e a tabela FTS5."""
+    from app import search
+    from app.utils import normalize_string
+
+    for col in search.SEARCH_COLUMNS:
+        if not _has_column("imoveis", f"{col}_norm"):
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE imoveis ADD COLUMN {col}_norm VARCHAR"))
+
+    with engine.begin() as connection:
+        last_id = 0
+        while True:
+            rows = connection.execute(text(
+                "SELECT id, cidade, bairro, tipo FROM imoveis WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            connection.execute(
+                text("UPDATE imoveis SET cidade_norm = :cidade, bairro_norm = :bairro, tipo_norm = :tipo WHERE id = :id"),
+                [{
+                    "id": row.id,
+                    "cidade": normalize_string(row.cidade) if row.cidade is not None else None,
+                    "bairro": normalize_string(row.bairro) if row.bairro is not None else None,
+                    "tipo": normalize_string(row.tipo) if row.tipo is not None else None,
+                } for row in rows]
+            )
+            last_id = rows[-1].id
+
+        for col in search.SEARCH_COLUMNS:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_imoveis_{col}_norm ON imoveis ({col}_norm)"
+            ))
+
+    search.setup_fulltext(engine)
+
+def build_price_rollups():
+    """Cria e preenche a tabela de rollups de preço usada pelo /stats."""
+    from app import models, stats
+
+    models.PriceRollup.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        stats.rebuild(db)
+    finally:
+        db.close()
+
+def _create_scrape_tables():
+    """Cria `scrape_jobs` e `scrape_tasks` em bancos anteriores à fila de scraping.
+
+    Tabelas criadas aqui já saem com as colunas atuais; os ALTERs seguintes
+    só valem para as que já existiam.
+    """
+    from app import models
+
+    models.ScrapeJob.__table__.create(bind=engine, checkfirst=True)
+    models.ScrapeTask.__table__.create(bind=engine, checkfirst=True)
+
+def add_incremental_crawl_columns(batch_size: int = 5000):
+    """Cria as colunas e a tabela do crawl incremental e preenche `content_hash`."""
+    from app import models
+    from app.crud import VALUE_COLUMNS, listing_content_hash
+
+    _create_scrape_tables()
+    if not _has_column("imoveis", "content_hash"):
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE imoveis ADD COLUMN content_hash VARCHAR"))
+    if not _has_column("scrape_jobs", "incremental"):
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE scrape_jobs ADD COLUMN incremental BOOLEAN NOT NULL DEFAULT FALSE"))
+    if not _has_column("scrape_jobs", "stopped_at_page"):
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE scrape_jobs ADD COLUMN stopped_at_page INTEGER"))
+    models.ScrapePageState.__table__.create(bind=engine, checkfirst=True)
+
+    columns = ", ".join(VALUE_COLUMNS)
+    with engine.begin() as connection:
+        last_id = 0
+        while True:
+            rows = connection.execute(text(
+                f"SELECT id, {columns} FROM imoveis WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).mappings().fetchall()
+            if not rows:
+                break
+            connection.execute(
+                text("UPDATE imoveis SET content_hash = :content_hash WHERE id = :id"),
+                [{"id": row["id"], "content_hash": listing_content_hash(row)} for row in rows]
+            )
+            last_id = rows[-1]["id"]
+
+def add_profile_column():
+    _create_scrape_tables()
+    if _has_column("scrape_jobs", "profile"):
+        return
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE scrape_jobs ADD COLUMN profile BOOLEAN NOT NULL DEFAULT FALSE"))
+
+def add_history_table():
+    """Cria `imovel_history`; anúncios já existentes só ganham histórico na próxima mudança."""
+    from app import models
+
+    models.ImovelHistory.__table__.create(bind=engine, checkfirst=True)
+
+def add_dedup_index():
+    """Cria a coluna `cluster_id` e as tabelas do índice LSH e agrupa os imóveis existentes."""
+    from app import dedup, models
+
+    if not _has_column("imoveis", "cluster_id"):
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE imoveis ADD COLUMN cluster_id INTEGER"))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_imoveis_cluster_id ON imoveis (cluster_id)"))
+    models.ImovelSignature.__table__.create(bind=engine, checkfirst=True)
+    models.ImovelLshBucket.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        dedup.rebuild(db)
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    add_tipo_column()
\ No newline at end of file
+    add_tipo_column()
+    add_listing_id_column()
+    add_keyset_indexes()
+    add_search_columns()
+    build_price_rollups()
+    add_incremental_crawl_columns()
+    add_history_table()
+    add_profile_column()
+    add_dedup_index()
@@ -4,11 +4,23 @@ import time
 tipo = input("tipo: ") or "venda"
 pages = input("pages: ") or 1000
 state = input("state: ") or "sp"
+# Incremental: só percorre até a primeira página sem anúncios novos ou alterados
+incremental = (input("incremental [S/n]: ") or "s").lower().startswith("s")
 
 print(f"Scraping {pages} pages of {tipo} in {state}")
 
-for i in range(1, int(pages)):
-    url = f"http://127.0.0.1:8000/scrape/olx?tipo={tipo}&estado={state}&start_page={i}&max_pages=1"
-    response = requests.post(url)
-    print(response.status_code)
-    time.sleep(30)
\ No newline at end of file
+url = f"http://127.0.0.1:8000/scrape/olx?tipo={tipo}&estado={state}&start_page=1&max_pages={int(pages)}&incremental={str(incremental).lower()}"
+response = requests.post(url)
+response.raise_for_status()
+job_id = response.json()["job_id"]
+print(f"Job {job_id} criado")
+
+while True:
+    job = requests.get(f"http://127.0.0.1:8000/scrape/jobs/{job_id}").json()
+    print(f"[{job['status']}] páginas: {job['pages_done']}/{job['max_pages']} "
+          f"falhas: {job['pages_failed']} imóveis: {job['listings_found']}")
+    if job["status"] in ("done", "failed"):
+        if job["stopped_at_page"]:
+            print(f"Nada novo a partir da página {job['stopped_at_page']}")
+        break
+    time.sleep(30)
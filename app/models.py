@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float
+from datetime import datetime
+from sqlalchemy import BigInteger, Boolean, Column, Integer, JSON, LargeBinary, String, Float, DateTime, Text, ForeignKey, Index
 from app.database import Base
 
 class Imovel(Base):
@@ -14,7 +15,148 @@ class Imovel(Base):
     num_vagas = Column(Integer)
     num_banheiros = Column(Integer)
     link = Column(String)
+    # Identidade do anúncio (ID da OLX ou hash do link), ver utils.listing_identity
+    listing_id = Column(String, unique=True, index=True)
+    # Hash dos campos raspados, ver crud.listing_content_hash
+    content_hash = Column(String)
+    # Cópias sem acento e em minúsculas para busca indexada, ver app/search.py
+    cidade_norm = Column(String, index=True)
+    bairro_norm = Column(String, index=True)
+    tipo_norm = Column(String, index=True)
+    # Menor id do grupo de quase duplicados do anúncio, ver app/dedup.py
+    cluster_id = Column(Integer, index=True)
+
+    __table_args__ = (
+        # Paginação por cursor ordenada por preço
+        Index("ix_imoveis_preco_id", "preco", "id"),
+    )
 
     def __repr__(self):
         return f"<Imovel(cidade={self.cidade}, bairro={self.bairro}, preco={self.preco}, link={self.link})>"
-    
\ No newline at end of file
+
+class PriceRollup(Base):
+    """Histograma de preços por grupo, mantido incrementalmente pelo crud (ver app/stats.py)."""
+    __tablename__ = "imovel_price_rollups"
+
+    id = Column(Integer, primary_key=True)
+    cidade_norm = Column(String, nullable=False, default="")
+    bairro_norm = Column(String, nullable=False, default="")
+    tipo_norm = Column(String, nullable=False, default="")
+    num_quartos = Column(Integer, nullable=False, default=0)
+    bucket = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    preco_sum = Column(Float, nullable=False, default=0.0)
+    preco_min = Column(Float)
+    preco_max = Column(Float)
+
+    GROUP_COLUMNS = ("cidade_norm", "bairro_norm", "tipo_norm", "num_quartos")
+
+    __table_args__ = (
+        Index("uq_imovel_price_rollups_key", *GROUP_COLUMNS, "bucket", unique=True),
+    )
+
+class ImovelHistory(Base):
+    """Histórico append-only de um anúncio: uma linha quando aparece e a cada mudança."""
+    __tablename__ = "imovel_history"
+
+    id = Column(Integer, primary_key=True)
+    listing_id = Column(String, nullable=False)
+    observed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # "new" na primeira vez que o anúncio é visto, "changed" nas alterações
+    event = Column(String, nullable=False)
+    preco = Column(Float)
+    preco_anterior = Column(Float)
+    # Só os demais campos que mudaram, com o valor novo
+    changes = Column(JSON)
+    cidade_norm = Column(String)
+    tipo_norm = Column(String)
+
+    __table_args__ = (
+        Index("ix_imovel_history_listing", "listing_id", "observed_at"),
+        # Feed de mudanças, do mais recente para o mais antigo (por cursor)
+        Index("ix_imovel_history_feed", "observed_at", "id"),
+        Index("ix_imovel_history_cidade_feed", "cidade_norm", "observed_at", "id"),
+    )
+
+    def __repr__(self):
+        return f"<ImovelHistory(listing_id={self.listing_id}, event={self.event}, preco={self.preco})>"
+
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String, nullable=False)
+    tipo = Column(String, nullable=False)
+    estado = Column(String, nullable=False)
+    start_page = Column(Integer, nullable=False)
+    max_pages = Column(Integer, nullable=False)
+    # Incremental: para na primeira página sem anúncios novos ou alterados
+    incremental = Column(Boolean, nullable=False, default=False)
+    stopped_at_page = Column(Integer)
+    # Grava um perfil (cProfile/pyinstrument) de cada tarefa, ver jobs.py
+    profile = Column(Boolean, nullable=False, default=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    pages_done = Column(Integer, nullable=False, default=0)
+    pages_failed = Column(Integer, nullable=False, default=0)
+    listings_found = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ScrapeJob(id={self.id}, source={self.source}, status={self.status})>"
+
+class ScrapeTask(Base):
+    __tablename__ = "scrape_tasks"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("scrape_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    start_page = Column(Integer, nullable=False)
+    num_pages = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    listings_found = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+
+    def __repr__(self):
+        return f"<ScrapeTask(job_id={self.job_id}, start_page={self.start_page}, status={self.status})>"
+
+class ScrapePageState(Base):
+    """Última versão vista de uma página de listagem, usada pelo crawl incremental."""
+    __tablename__ = "scrape_page_states"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String, nullable=False)
+    tipo = Column(String, nullable=False)
+    estado = Column(String, nullable=False)
+    page_number = Column(Integer, nullable=False)
+    fingerprint = Column(String, nullable=False)
+    listing_ids = Column(JSON, nullable=False, default=list)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_scrape_page_states_key", "source", "tipo", "estado", "page_number", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<ScrapePageState(source={self.source}, tipo={self.tipo}, estado={self.estado}, page={self.page_number})>"
+
+class ImovelSignature(Base):
+    """Assinatura MinHash de um imóvel, usada na detecção de quase duplicados (ver app/dedup.py)."""
+    __tablename__ = "imovel_signatures"
+
+    imovel_id = Column(Integer, ForeignKey("imoveis.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class ImovelLshBucket(Base):
+    """Uma faixa da assinatura de um imóvel no índice LSH; faixas iguais apontam candidatos."""
+    __tablename__ = "imovel_lsh_buckets"
+
+    id = Column(Integer, primary_key=True)
+    imovel_id = Column(Integer, ForeignKey("imoveis.id"), nullable=False, index=True)
+    bucket = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_imovel_lsh_buckets_bucket", "bucket"),
+    )
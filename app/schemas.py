@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 
 class ImovelBase(BaseModel):
@@ -29,6 +30,91 @@ class ImovelUpdate(BaseModel):
 
 class Imovel(ImovelBase):
     id: int
+    listing_id: str | None = None
+    cluster_id: int | None = None
 
     class Config:
-        from_attributes = True  # novo nome para orm_mode no Pydantic v2
\ No newline at end of file
+        from_attributes = True  # novo nome para orm_mode no Pydantic v2
+
+
+class ImovelPage(BaseModel):
+    items: list[dict]
+    next_cursor: str | None = None
+
+class PriceStats(BaseModel):
+    group: dict
+    count: int
+    min: float
+    max: float
+    mean: float
+    median: float
+    percentiles: dict[str, float]
+
+
+class PricePoint(BaseModel):
+    observed_at: datetime
+    event: str
+    preco: float | None = None
+    preco_anterior: float | None = None
+    changes: dict | None = None
+
+    class Config:
+        from_attributes = True
+
+class PriceHistory(BaseModel):
+    listing_id: str
+    first_seen: datetime | None = None
+    points: list[PricePoint]
+
+class PriceChange(PricePoint):
+    id: int
+    listing_id: str
+    cidade_norm: str | None = None
+    tipo_norm: str | None = None
+
+class PriceChangePage(BaseModel):
+    items: list[PriceChange]
+    next_cursor: str | None = None
+
+class DuplicateCluster(BaseModel):
+    cluster_id: int
+    size: int
+    preco_min: float | None = None
+    preco_max: float | None = None
+    imovel_ids: list[int]
+
+
+class ScrapeJobCreate(BaseModel):
+    source: str
+    tipo: str
+    estado: str
+    start_page: int = Field(1, ge=1)
+    max_pages: int = Field(10, ge=1)
+    incremental: bool = False
+    profile: bool = False
+
+class ScrapeJob(ScrapeJobCreate):
+    id: int
+    status: str
+    pages_done: int
+    pages_failed: int
+    listings_found: int
+    stopped_at_page: int | None = None
+    last_error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class IngestResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.received / self.elapsed if self.elapsed else 0.0
@@ -1,9 +1,14 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
 import re
 from unidecode import unidecode
 
 class BaseImovelScraper(ABC):
+    # Scrapers reaproveitados entre crawls (como os dos workers da fila)
+    # desligam isto e chamam `close()` quando terminam de usá-los
+    close_after_crawl = True
+
     def __init__(self):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
@@ -29,6 +34,42 @@ class BaseImovelScraper(ABC):
         text = " ".join(text.split())
         return text
 
+    def close(self) -> None:
+        """Libera navegadores e conexões abertos pelo scraper."""
+
+    def warm_up(self) -> None:
+        """Abre antes do primeiro crawl o que é caro de iniciar (navegadores, por exemplo)."""
+
     @abstractmethod
     def scrape_imoveis(self, **kwargs) -> List[Dict]:
-        pass
\ No newline at end of file
+        pass
+
+    def iter_pages(self, **kwargs) -> Iterator[Tuple[int, List[Dict]]]:
+        """Gera (número da página, imóveis) conforme as páginas ficam prontas.
+
+        A implementação padrão entrega tudo de `scrape_imoveis` como um único
+        lote; scrapers que conseguem entregar página a página sobrescrevem.
+        """
+        yield kwargs.get('start_page', 1), self.scrape_imoveis(**kwargs)
+
+    def iter_imoveis(self, **kwargs) -> Iterator[Dict]:
+        for _, imoveis in self.iter_pages(**kwargs):
+            yield from imoveis
+
+    async def aiter_pages(self, **kwargs) -> AsyncIterator[Tuple[int, List[Dict]]]:
+        """Versão assíncrona de `iter_pages`; o scraping roda em uma thread."""
+        pages = self.iter_pages(**kwargs)
+        done = object()
+        try:
+            while True:
+                batch = await asyncio.to_thread(next, pages, done)
+                if batch is done:
+                    break
+                yield batch
+        finally:
+            await asyncio.to_thread(pages.close)
+
+    async def aiter_imoveis(self, **kwargs) -> AsyncIterator[Dict]:
+        async for _, imoveis in self.aiter_pages(**kwargs):
+            for imovel in imoveis:
+                yield imovel
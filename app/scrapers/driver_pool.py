@@ -0,0 +1,141 @@
+import atexit
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from app import metrics
+
+
+DEFAULT_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "4"))
+DEFAULT_MAX_USES = int(os.getenv("SCRAPER_DRIVER_MAX_USES", "50"))
+
+
+class DriverPool:
+    """Pool limitado de instâncias do Chrome reutilizadas entre páginas.
+
+    Cada driver é emprestado a um worker por vez, verificado antes do uso e
+    reciclado depois de `max_uses` páginas ou quando ocorre uma falha.
+    """
+
+    def __init__(
+        self,
+        options_factory: Callable,
+        size: Optional[int] = None,
+        max_uses: Optional[int] = None
+    ):
+        self.options_factory = options_factory
+        self.size = size or DEFAULT_POOL_SIZE
+        self.max_uses = max_uses or DEFAULT_MAX_USES
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._uses = {}
+        self._lock = threading.Lock()
+
+    def _create_driver(self):
+        with metrics.SCRAPER_STAGE_SECONDS.time(stage="driver_startup"):
+            driver = webdriver.Chrome(options=self.options_factory())
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver) -> None:
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _is_healthy(self, driver) -> bool:
+        try:
+            driver.execute_script("return 1;")
+            return True
+        except WebDriverException:
+            return False
+
+    def _checkout(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return self._create_driver()
+            if self._is_healthy(driver):
+                return driver
+            print("[WARN] Discarding unhealthy driver")
+            self._discard(driver)
+
+    def _checkin(self, driver, failed: bool) -> None:
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+        if failed or uses >= self.max_uses:
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    @contextmanager
+    def lease(self):
+        """Empresta um driver do pool, bloqueando até haver um disponível."""
+        self._slots.acquire()
+        driver = None
+        failed = False
+        try:
+            driver = self._checkout()
+            yield driver
+        except WebDriverException:
+            failed = True
+            raise
+        finally:
+            if driver is not None:
+                self._checkin(driver, failed)
+            self._slots.release()
+
+    def warm_up(self, count: Optional[int] = None) -> None:
+        """Inicia previamente `count` drivers (padrão: o tamanho do pool)."""
+        count = min(count or self.size, self.size)
+        for _ in range(count - self._idle.qsize()):
+            self._idle.put(self._create_driver())
+
+    def close(self) -> None:
+        """Encerra os drivers ociosos; o pool pode voltar a ser usado depois."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_shared_pools: Dict[str, DriverPool] = {}
+_shared_pools_lock = threading.Lock()
+
+
+def get_shared_pool(name: str, options_factory: Callable) -> DriverPool:
+    """Pool `name` compartilhado pelo processo; `options_factory` só vale na criação.
+
+    Scrapers e workers da mesma fonte dividem os navegadores, então o
+    processo abre no máximo `SCRAPER_POOL_SIZE` instâncias do Chrome por fonte.
+    """
+    with _shared_pools_lock:
+        pool = _shared_pools.get(name)
+        if pool is None:
+            if not _shared_pools:
+                atexit.register(close_shared_pools)
+            pool = _shared_pools[name] = DriverPool(options_factory)
+        return pool
+
+
+def close_shared_pools() -> None:
+    with _shared_pools_lock:
+        pools = list(_shared_pools.values())
+    for pool in pools:
+        pool.close()
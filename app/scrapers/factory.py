@@ -1,15 +1,79 @@
-from typing import Dict, Type
+import importlib
+import logging
+import threading
+from importlib.metadata import entry_points
+from typing import Dict, List, Type
 from app.scrapers.base import BaseImovelScraper
-from app.scrapers.olx import OLXScraper
+
+logger = logging.getLogger(__name__)
+
+# Pacotes externos registram scrapers neste grupo de entry points, ex:
+#   [project.entry-points."imoveis.scrapers"]
+#   zap = "imoveis_zap.scraper:ZapScraper"
+ENTRY_POINT_GROUP = "imoveis.scrapers"
 
 class ScraperFactory:
-    _scrapers: Dict[str, Type[BaseImovelScraper]] = {
-        'olx': OLXScraper,
+    """Registro de scrapers por nome de fonte.
+
+    Os scrapers embutidos e os de entry points ficam registrados como
+    "módulo:Classe" e só são importados no primeiro uso, para que a API não
+    carregue Selenium e afins ao subir.
+    """
+    _scrapers: Dict[str, str] = {
+        'olx': 'app.scrapers.olx:OLXScraper',
     }
+    _loaded: Dict[str, Type[BaseImovelScraper]] = {}
+    _discovered = False
+    _lock = threading.Lock()
 
     @classmethod
-    def get_scraper(cls, source: str) -> BaseImovelScraper:
-        scraper_class = cls._scrapers.get(source.lower())
-        if not scraper_class:
+    def _discover(cls) -> None:
+        with cls._lock:
+            if cls._discovered:
+                return
+            for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+                name = entry_point.name.lower()
+                if name in cls._scrapers:
+                    logger.warning(f"Scraper '{name}' de {entry_point.value} ignorado: nome já registrado")
+                    continue
+                cls._scrapers[name] = entry_point.value
+            cls._discovered = True
+
+    @classmethod
+    def register(cls, source: str, target: str) -> None:
+        """Registra um scraper como "módulo:Classe", importado só quando usado."""
+        with cls._lock:
+            cls._scrapers[source.lower()] = target
+            cls._loaded.pop(source.lower(), None)
+
+    @classmethod
+    def sources(cls) -> List[str]:
+        cls._discover()
+        return sorted(cls._scrapers)
+
+    @classmethod
+    def get_scraper_class(cls, source: str) -> Type[BaseImovelScraper]:
+        cls._discover()
+        source = source.lower()
+        scraper_class = cls._loaded.get(source)
+        if scraper_class:
+            return scraper_class
+        target = cls._scrapers.get(source)
+        if not target:
             raise ValueError(f"Scraper não encontrado para: {source}")
-        return scraper_class()
\ No newline at end of file
+        module_name, _, attr = target.partition(':')
+        scraper_class = getattr(importlib.import_module(module_name), attr)
+        if not (isinstance(scraper_class, type) and issubclass(scraper_class, BaseImovelScraper)):
+            raise ValueError(f"{target} não é um BaseImovelScraper")
+        cls._loaded[source] = scraper_class
+        return scraper_class
+
+    @classmethod
+    def is_registered(cls, source: str) -> bool:
+        """Confere o nome sem importar o módulo do scraper."""
+        cls._discover()
+        return source.lower() in cls._scrapers
+
+    @classmethod
+    def get_scraper(cls, source: str) -> BaseImovelScraper:
+        return cls.get_scraper_class(source)()
@@ -0,0 +1,128 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from app import metrics
+from app.scrapers.driver_pool import DriverPool
+
+
+HTTP_TIMEOUT = float(os.getenv("SCRAPER_HTTP_TIMEOUT", "15"))
+HTTP_MAX_PER_HOST = int(os.getenv("SCRAPER_HTTP_MAX_PER_HOST", "8"))
+
+CHALLENGE_MARKERS = (
+    "cf-challenge",
+    "challenge-platform",
+    "<title>just a moment",
+    "attention required! | cloudflare",
+    "px-captcha",
+    "<title>access denied",
+)
+
+
+def looks_like_challenge(html: str) -> bool:
+    """Detecta páginas de verificação anti-bot (Cloudflare, captcha etc)."""
+    head = html[:20000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def _retry_after(response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+class PageFetcher(ABC):
+    """Camada de download de páginas usada pelos scrapers."""
+
+    @abstractmethod
+    def fetch(self, url: str) -> Optional[str]:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class HttpFetcher(PageFetcher):
+    """Baixa páginas com uma `requests.Session` reaproveitando conexões."""
+
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        max_per_host: Optional[int] = None,
+        timeout: Optional[float] = None,
+        on_throttle: Optional[Callable[[str, Optional[float]], None]] = None
+    ):
+        self.timeout = timeout or HTTP_TIMEOUT
+        # Avisado com (url, Retry-After) quando o site responde 403/429
+        self.on_throttle = on_throttle
+        max_per_host = max_per_host or HTTP_MAX_PER_HOST
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        # requests só descomprime brotli se o pacote estiver instalado
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch(self, url: str) -> Optional[str]:
+        try:
+            with metrics.SCRAPER_STAGE_SECONDS.time(stage="http_fetch"):
+                response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"[WARN] HTTP fetch failed for {url}: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"[WARN] HTTP fetch returned {response.status_code} for {url}")
+            if response.status_code in (403, 429) and self.on_throttle:
+                self.on_throttle(url, _retry_after(response))
+            return None
+        return response.text
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class SeleniumFetcher(PageFetcher):
+    """Baixa páginas renderizadas com os drivers emprestados do `DriverPool`."""
+
+    def __init__(self, driver_pool: DriverPool, owns_pool: bool = True):
+        self.driver_pool = driver_pool
+        self.owns_pool = owns_pool
+
+    def fetch(self, url: str) -> Optional[str]:
+        with self.driver_pool.lease() as driver:
+            with metrics.SCRAPER_STAGE_SECONDS.time(stage="page_load"):
+                driver.get(url)
+                driver.execute_script("window.stop();")
+            print("[INFO] Get page source")
+            return driver.page_source
+
+    def close(self) -> None:
+        if self.owns_pool:
+            self.driver_pool.close()
+
+
+class FallbackFetcher(PageFetcher):
+    """Tenta o fetcher primário e recorre ao secundário quando `is_valid` falha.
+
+    O HTML devolvido é o mesmo em ambos os caminhos, então o parser não
+    precisa saber de onde a página veio.
+    """
+
+    def __init__(self, primary: PageFetcher, fallback: PageFetcher, is_valid: Callable[[str], bool]):
+        self.primary = primary
+        self.fallback = fallback
+        self.is_valid = is_valid
+
+    def fetch(self, url: str) -> Optional[str]:
+        page = self.primary.fetch(url)
+        if page and self.is_valid(page):
+            return page
+        print(f"[INFO] Falling back to {type(self.fallback).__name__} for {url}")
+        return self.fallback.fetch(url)
+
+    def close(self) -> None:
+        self.primary.close()
+        self.fallback.close()
@@ -0,0 +1,169 @@
+"""Crawl de vários portais ao mesmo tempo, com a saída unida em um único fluxo.
+
+Cada fonte roda o seu `iter_pages` em uma thread; os downloads de todas
+passam por um semáforo comum (`SCRAPER_FANOUT_BUDGET`), além do ritmo por
+host do scheduler. As páginas chegam na ordem em que ficam prontas, com os
+imóveis marcados com a fonte e sem os que já vieram de outro portal.
+
+Uso: python -m app.scrapers.multi --sources olx,zap --tipo venda --estado sp
+     [--start-page 1] [--max-pages 3] [--ingest]
+"""
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from app import utils
+from app.scrapers.factory import ScraperFactory
+from app.scrapers.fetchers import PageFetcher
+from app.scrapers.pipeline import shutdown_parse_pool
+
+logger = logging.getLogger(__name__)
+
+# Downloads simultâneos somando todas as fontes de um crawl
+FANOUT_BUDGET = int(os.getenv("SCRAPER_FANOUT_BUDGET", "4"))
+
+_DONE = object()
+
+
+class BudgetedFetcher(PageFetcher):
+    """Limita os downloads de vários fetchers por um semáforo compartilhado."""
+
+    def __init__(self, inner: PageFetcher, budget: threading.Semaphore):
+        self.inner = inner
+        self.budget = budget
+
+    def fetch(self, url: str) -> Optional[str]:
+        with self.budget:
+            return self.inner.fetch(url)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+def merge_key(imovel: Dict) -> Tuple:
+    """Chave do mesmo imóvel anunciado em portais diferentes.
+
+    Os links e IDs variam entre portais; tipo, local, números e preço
+    (arredondado ao real) normalizados, não.
+    """
+    return (
+        utils.normalize_string(imovel.get('tipo') or ''),
+        utils.normalize_string(imovel.get('cidade') or ''),
+        utils.normalize_string(imovel.get('bairro') or ''),
+        imovel.get('num_quartos'),
+        imovel.get('num_vagas'),
+        imovel.get('num_banheiros'),
+        round(imovel.get('preco') or 0),
+    )
+
+
+def _crawl(source: str, scraper, out: queue.Queue, stop: threading.Event, kwargs: Dict) -> None:
+    pages = scraper.iter_pages(**kwargs)
+    try:
+        for page_number, imoveis in pages:
+            if stop.is_set():
+                break
+            out.put((source, page_number, imoveis))
+    except Exception as e:
+        logger.exception(f"Crawl de {source} interrompido: {e}")
+    finally:
+        pages.close()
+        out.put((source, _DONE, None))
+
+
+def iter_merged_pages(
+    sources: Sequence[str],
+    budget: int = FANOUT_BUDGET,
+    **kwargs
+) -> Iterator[Tuple[str, int, List[Dict]]]:
+    """Gera (fonte, número da página, imóveis) de todas as fontes à medida que ficam prontos.
+
+    `kwargs` vão para o `iter_pages` de cada scraper. Um imóvel cuja
+    `merge_key` já apareceu em outra fonte é descartado; repetições dentro
+    da mesma fonte ficam para a ingestão, que deduplica por `listing_id`.
+    Uma fonte que falha é registrada no log sem interromper as demais.
+    """
+    shared = threading.BoundedSemaphore(max(1, budget))
+    scrapers = {}
+    for source in dict.fromkeys(s.lower() for s in sources):
+        scraper = ScraperFactory.get_scraper(source)
+        if isinstance(getattr(scraper, 'fetcher', None), PageFetcher):
+            scraper.fetcher = BudgetedFetcher(scraper.fetcher, shared)
+        scrapers[source] = scraper
+
+    out: queue.Queue = queue.Queue(maxsize=2 * max(1, budget))
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_crawl, args=(source, scraper, out, stop, kwargs), name=f"crawl-{source}", daemon=True)
+        for source, scraper in scrapers.items()
+    ]
+    for thread in threads:
+        thread.start()
+
+    seen: Dict[Tuple, str] = {}
+    duplicates = 0
+    running = len(threads)
+    try:
+        while running:
+            source, page_number, imoveis = out.get()
+            if page_number is _DONE:
+                running -= 1
+                continue
+            merged = []
+            for imovel in imoveis:
+                key = merge_key(imovel)
+                if seen.setdefault(key, source) != source:
+                    duplicates += 1
+                    continue
+                merged.append({**imovel, 'source': source})
+            yield source, page_number, merged
+    finally:
+        stop.set()
+        # Libera threads bloqueadas no put da fila cheia
+        while any(thread.is_alive() for thread in threads):
+            try:
+                out.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        logger.info(f"Crawl de {', '.join(scrapers)}: {duplicates} imóveis repetidos entre fontes descartados")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", default=",".join(ScraperFactory.sources()), help="fontes separadas por vírgula")
+    parser.add_argument("--tipo", required=True)
+    parser.add_argument("--estado", required=True)
+    parser.add_argument("--start-page", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=FANOUT_BUDGET, help="downloads simultâneos entre todas as fontes")
+    parser.add_argument("--ingest", action="store_true", help="grava os imóveis extraídos no banco")
+    args = parser.parse_args()
+
+    db = None
+    if args.ingest:
+        from app import crud, database
+        db = database.WriterSessionLocal()
+
+    started = time.perf_counter()
+    cards: Dict[str, int] = {}
+    try:
+        for source, _, imoveis in iter_merged_pages(
+            args.sources.split(","), budget=args.budget,
+            tipo=args.tipo, estado=args.estado, start_page=args.start_page, max_pages=args.max_pages
+        ):
+            cards[source] = cards.get(source, 0) + len(imoveis)
+            if db is not None:
+                crud.bulk_upsert_imoveis(db, imoveis)
+    finally:
+        if db is not None:
+            db.close()
+        shutdown_parse_pool()
+    totals = ", ".join(f"{source}: {count}" for source, count in cards.items())
+    print(f"{sum(cards.values())} imóveis ({totals}) em {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,59 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, List, Optional
-from selenium import webdriver
+from typing import Dict, Iterator, List, Optional, Tuple
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
-from bs4 import BeautifulSoup
-import random
 from fake_useragent import UserAgent
 import re
 import time
-import json
 from app.scrapers.base import BaseImovelScraper
+from app.scrapers.driver_pool import DriverPool, get_shared_pool
+from app.scrapers.parsers import CardParser, default_parser, has_embedded_ads
+from app.scrapers.pipeline import iter_parsed_pages
+from app.scrapers.scheduler import ScheduledFetcher, report_throttle
+from app.scrapers.page_cache import CachingFetcher, get_page_cache
+from app.scrapers.fetchers import (
+    FallbackFetcher, HttpFetcher, PageFetcher, SeleniumFetcher, looks_like_challenge
+)
 
 
 
 class OLXScraper(BaseImovelScraper):
-    def __init__(self):
+    source = "olx"
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        driver_pool: Optional[DriverPool] = None,
+        fetcher: Optional[PageFetcher] = None,
+        parser: Optional[CardParser] = None
+    ):
         super().__init__()
         self.base_url = "https://www.olx.com.br/imoveis"
-        self.delay = random.uniform(5, 15)
         self.user_agent = UserAgent()
+        if driver_pool is None and pool_size is None:
+            # Sem tamanho próprio, usa o pool do processo, que continua aberto
+            # entre os scrapers (workers da fila, endpoints)
+            driver_pool = get_shared_pool(self.source, self._get_chrome_options)
+        # Um pool recebido de fora é compartilhado e não é fechado pelo scraper
+        owns_pool = driver_pool is None
+        self.driver_pool = driver_pool or DriverPool(self._get_chrome_options, size=pool_size)
+        self._owns_fetcher = fetcher is None
+        # O ritmo por host (e as novas tentativas) fica a cargo do scheduler
+        self.fetcher = fetcher or ScheduledFetcher(
+            FallbackFetcher(
+                HttpFetcher(self.headers, max_per_host=self.driver_pool.size, on_throttle=report_throttle),
+                SeleniumFetcher(self.driver_pool, owns_pool=owns_pool),
+                is_valid=self.page_has_listings
+            ),
+            is_valid=self.page_has_listings
+        )
+        cache = get_page_cache()
+        if fetcher is None and cache is not None:
+            # Guarda o HTML para reprocessar depois sem baixar de novo (ver replay.py)
+            self.fetcher = CachingFetcher(self.fetcher, cache, is_valid=self.page_has_listings)
+        self.parser = parser or default_parser(self)
         #self.options = '--headless'
 
     def _get_chrome_options(self) -> Options:
@@ -35,6 +67,15 @@ class OLXScraper(BaseImovelScraper):
         options.add_experimental_option('useAutomationExtension', False)
         return options
 
+    def warm_up(self) -> None:
+        self.driver_pool.warm_up()
+
+    def page_has_listings(self, page: str) -> bool:
+        """Indica se o HTML já traz os anúncios (cards renderizados ou JSON embutido)."""
+        if looks_like_challenge(page):
+            return False
+        return 'DS-AdCard' in page or has_embedded_ads(page)
+
     def get_location_info(self, location_text: str) -> tuple:
         parts = location_text.split(',')
         if len(parts) >= 2:
@@ -43,27 +84,64 @@ class OLXScraper(BaseImovelScraper):
             return bairro, cidade
         return "N/A", "N/A"
 
+    def parse_labels(self, labels: List[str]) -> Dict:
+        """Converte os aria-labels do card (quartos, área, vagas, banheiros) em números."""
+        values = {}
+        for label in labels:
+            num = self.extract_number(label)
+            if 'quartos' in label:
+                values['num_quartos'] = num
+            elif 'metros quadrados' in label:
+                values['area'] = num
+            elif ('vaga' in label) or ('vagas' in label):
+                values['num_vagas'] = num
+            elif ('banheiro' in label) or ('banheiros' in label):
+                values['num_banheiros'] = num
+        return values
+
+    def build_listing(
+        self,
+        tipo: str,
+        titulo: str,
+        price_text: str,
+        location_text: str,
+        link: str,
+        labels: Optional[List[str]]
+    ) -> Dict:
+        """Monta o dicionário do imóvel a partir dos textos crus do card.
+
+        Compartilhado pelos parsers para que todos gerem a mesma saída. Sem a
+        lista de labels os números ficam zerados; com a lista, todos os quatro
+        são obrigatórios (KeyError caso falte algum).
+        """
+        if labels is None:
+            counts = {'num_quartos': 0, 'area': 0, 'num_vagas': 0, 'num_banheiros': 0}
+        else:
+            counts = self.parse_labels(labels)
+
+        bairro, cidade = self.get_location_info(location_text)
+        bairro = self.clean_text(bairro)
+        cidade = self.clean_text(cidade)
+
+        return {
+            'titulo': self.clean_text(titulo.strip()),
+            'tipo': tipo,
+            'preco': self.clean_price(price_text),
+            'cidade': cidade,
+            'bairro': bairro,
+            'link': link,
+            'num_quartos': counts['num_quartos'],
+            'num_vagas': counts['num_vagas'],
+            'num_banheiros': counts['num_banheiros'],
+            'area': counts['area']
+        }
+
     def extract_details(self, card, tipo) -> Dict:
         try:
             details = card.select_one('.olx-ad-card__labels-items')
+            labels = None
             if details:
-                for item in details.find_all('li'):
-                    span = item.find('span')
-                    label = span['aria-label']
-                    num = self.extract_number(label)
-                    if 'quartos' in label:
-                        num_quartos = num
-                    elif 'metros quadrados' in label:
-                        area = num
-                    elif ('vaga' in label) or ('vagas' in label):
-                        num_vagas = num
-                    elif ('banheiro' in label) or ('banheiros' in label):
-                        num_banheiros = num
-            else:
-                num_quartos = 0
-                area = 0
-                num_vagas = 0
-                num_banheiros = 0
+                labels = [item.find('span')['aria-label'] for item in details.find_all('li')]
 
             price_element = card.select_one('.olx-ad-card__price')
             location_element = card.select_one('.olx-ad-card__location')
@@ -71,76 +149,60 @@ class OLXScraper(BaseImovelScraper):
             price_text = price_element.get_text(strip=True) if price_element else "0"
             location_text = location_element.get_text(strip=True) if location_element else "N/A"
 
-            bairro, cidade = self.get_location_info(location_text)
-            bairro = self.clean_text(bairro)
-            cidade = self.clean_text(cidade)
-            titulo = self.clean_text(card.select_one('h2').text.strip())
-            
-            return {
-                'titulo': titulo,
-                'tipo': tipo,
-                'preco': self.clean_price(price_text),
-                'cidade': cidade,
-                'bairro': bairro,
-                'link': card.select_one('a')['href'],
-                'num_quartos': num_quartos,
-                'num_vagas': num_vagas,
-                'num_banheiros': num_banheiros,
-                'area': area
-            }
+            return self.build_listing(
+                tipo,
+                card.select_one('h2').text,
+                price_text,
+                location_text,
+                card.select_one('a')['href'],
+                labels
+            )
         except Exception as e:
             print(f"Erro ao extrair detalhes do card: {e}")
 
     
-    def scrape_imoveis(self, **kwargs) -> List[Dict]:
+    def __getstate__(self):
+        # Só o necessário para parsear em outro processo (ver pipeline.py):
+        # navegadores, sessão HTTP e gerador de user-agent ficam no processo pai
+        state = self.__dict__.copy()
+        for key in ('driver_pool', 'fetcher', 'user_agent'):
+            state.pop(key, None)
+        return state
+
+    def page_url(self, tipo: str, estado: str, page_number: int) -> str:
+        return f"{self.base_url}/{tipo}/estado-{estado}?lis=home_body_search_bar_1001&o={page_number}"
+
+    def iter_pages(self, **kwargs) -> Iterator[Tuple[int, List[Dict]]]:
+        """Gera (número da página, imóveis) à medida que cada página é parseada."""
         tipo = kwargs.get('tipo')
         estado = kwargs.get('estado')
         start_page = kwargs.get('start_page', 1)
         max_pages = start_page + kwargs.get('max_pages', 3)
 
-        #time.sleep(self.delay)
+        pages = [(n, self.page_url(tipo, estado, n)) for n in range(start_page, max_pages)]
 
-        results = []
-        #for page in max_pages:
-        def process_page(page_number: int) -> List[Dict]:
-            url = f"{self.base_url}/{tipo}/estado-{estado}?lis=home_body_search_bar_1001&o={page_number}"
-            
+        def fetch(url: str) -> Optional[str]:
             print(f"[INFO] Starting scraping for {url}")
-            options = self._get_chrome_options()
-            driver = webdriver.Chrome(options=options)
-            driver.get(url)
-            
-            driver.execute_script("window.stop();")
-            
-            #driver.save_screenshot(f"page_{page_number}.png")
-            print("[INFO] Get page source")
-            page = driver.page_source
-            driver.quit()
-
-            if not page:
-                print("[ERROR] Could not get page source")
-                return []
-            
-            print("[INFO] Extracting data from page")
-            soup = BeautifulSoup(page, 'html.parser')
-            cards = soup.find_all('section', attrs={'data-ds-component': 'DS-AdCard'})
-            print(f"[INFO] Found {len(cards)} cards")
-
-            print("[INFO] Extracting data from cards")
-            imoveis = []
-            for card in cards:
-                details = self.extract_details(card, tipo)
-                if details:
-                    #print(json.dumps(details, indent=2))
-                    imoveis.append(details)
-            print(f"[INFO] Finished scraping page {page_number}")
-            return imoveis
-        
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_page, page) for page in range(start_page, max_pages)]
-            for future in futures:
-                results.extend(future.result())
-        print(results)
+            return self.fetcher.fetch(url)
+
+        try:
+            for page_number, imoveis in iter_parsed_pages(
+                fetch, self.parser, pages, tipo, fetch_workers=self.driver_pool.size, source=self.source
+            ):
+                print(f"[INFO] Extracted {len(imoveis)} cards from page {page_number}")
+                yield page_number, imoveis
+        finally:
+            if self.close_after_crawl:
+                self.close()
+
+    def close(self) -> None:
+        if self._owns_fetcher:
+            self.fetcher.close()
+
+    def scrape_imoveis(self, **kwargs) -> List[Dict]:
+        results = []
+        for _, imoveis in self.iter_pages(**kwargs):
+            results.extend(imoveis)
         return results
 
   
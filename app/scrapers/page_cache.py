@@ -0,0 +1,195 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Iterator, Optional, Tuple
+from app.scrapers.fetchers import PageFetcher
+
+# Vazio desativa o cache
+CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR", "./page_cache")
+CACHE_MAX_MB = int(os.getenv("SCRAPER_CACHE_MAX_MB", "1024"))
+CACHE_TTL_DAYS = float(os.getenv("SCRAPER_CACHE_TTL_DAYS", "14"))
+# Idade máxima (segundos) de uma página servida do cache em vez de baixada; 0 sempre baixa
+CACHE_MAX_AGE = float(os.getenv("SCRAPER_CACHE_MAX_AGE", "0"))
+
+
+class PageCache:
+    """Cache em disco das páginas baixadas, endereçado por conteúdo.
+
+    Cada página é gravada comprimida (zlib) em `blobs/` com o SHA-256 do
+    HTML como nome, então páginas idênticas ocupam um só arquivo. Um índice
+    SQLite registra cada download (URL, horário, blob). Entradas mais velhas
+    que `ttl` são ignoradas nas leituras e removidas a cada gravação; acima
+    de `max_bytes`, as mais antigas também saem.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY, url TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "digest TEXT NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_entries_url ON entries (url, fetched_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_entries_digest ON entries (digest)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_entries_fetched_at ON entries (fetched_at)")
+        self._db.commit()
+        self._bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)"
+        ).fetchone()[0]
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], f"{digest}.z")
+
+    def put(self, url: str, page: str, fetched_at: Optional[float] = None) -> str:
+        raw = page.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            known = self._db.execute("SELECT size FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+            if known:
+                size = known[0]
+            else:
+                data = zlib.compress(raw, 6)
+                size = len(data)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                self._bytes += size
+            self._db.execute(
+                "INSERT INTO entries (url, fetched_at, digest, size) VALUES (?, ?, ?, ?)",
+                (url, fetched_at or time.time(), digest, size)
+            )
+            self._db.commit()
+            self._evict(self._expired_before())
+        return digest
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl
+
+    def read_blob(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Versão mais recente de `url`, se houver uma com no máximo `max_age` segundos."""
+        fetched_after = self._expired_before()
+        if max_age:
+            fetched_after = max(fetched_after, time.time() - max_age)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM entries WHERE url = ? AND fetched_at >= ? ORDER BY fetched_at DESC LIMIT 1",
+                (url, fetched_after)
+            ).fetchone()
+        return self.read_blob(row[0]) if row else None
+
+    def latest(self, url_prefix: str = "") -> Iterator[Tuple[str, float, str]]:
+        """Gera (url, horário, digest) da versão mais recente de cada URL com o prefixo.
+
+        URLs cujas versões já passaram do `ttl` ficam de fora.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, MAX(fetched_at), digest FROM entries "
+                "WHERE url >= ? AND url < ? AND fetched_at >= ? GROUP BY url ORDER BY url",
+                (url_prefix, url_prefix + "\uffff", self._expired_before())
+            ).fetchall()
+        yield from rows
+
+    def _evict(self, expired_before: float) -> None:
+        expired = self._db.execute(
+            "SELECT id, digest FROM entries WHERE fetched_at < ?", (expired_before,)
+        ).fetchall()
+        for entry_id, digest in expired:
+            self._delete_entry(entry_id, digest)
+        while self._bytes > self.max_bytes:
+            oldest = self._db.execute(
+                "SELECT id, digest FROM entries ORDER BY fetched_at LIMIT 100"
+            ).fetchall()
+            if not oldest:
+                break
+            for entry_id, digest in oldest:
+                self._delete_entry(entry_id, digest)
+                if self._bytes <= self.max_bytes:
+                    break
+        self._db.commit()
+
+    def _delete_entry(self, entry_id: int, digest: str) -> None:
+        self._db.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+        if self._db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return
+        path = self._blob_path(digest)
+        try:
+            self._bytes -= os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(self._expired_before())
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Cache compartilhado pelo processo; None se `SCRAPER_CACHE_DIR` estiver vazio."""
+    global _page_cache
+    if not CACHE_DIR:
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache(CACHE_DIR, CACHE_MAX_MB * 1024 * 1024, CACHE_TTL_DAYS * 86400)
+        return _page_cache
+
+
+class CachingFetcher(PageFetcher):
+    """Guarda no `PageCache` toda página válida baixada por outro fetcher.
+
+    Com `max_age`, devolve a cópia do cache quando ela é recente o bastante,
+    sem tocar a rede.
+    """
+
+    def __init__(
+        self,
+        inner: PageFetcher,
+        cache: PageCache,
+        is_valid: Callable[[str], bool],
+        max_age: float = CACHE_MAX_AGE
+    ):
+        self.inner = inner
+        self.cache = cache
+        self.is_valid = is_valid
+        self.max_age = max_age
+
+    def fetch(self, url: str) -> Optional[str]:
+        if self.max_age:
+            page = self.cache.get(url, self.max_age)
+            if page is not None:
+                return page
+        page = self.inner.fetch(url)
+        if page and self.is_valid(page):
+            self.cache.put(url, page)
+        return page
+
+    def close(self) -> None:
+        self.inner.close()
@@ -0,0 +1,216 @@
+import json
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml é opcional; sem ele usa-se o BeautifulSoup
+    lxml_html = None
+
+CARD_ATTRS = {'data-ds-component': 'DS-AdCard'}
+
+
+class CardParser(ABC):
+    """Transforma o HTML de uma página de listagem em dicionários de imóveis."""
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        # Cards que falharam na extração, lidos pelas métricas (ver pipeline._parse)
+        self.failures = 0
+
+    @abstractmethod
+    def parse(self, page: str, tipo: str) -> List[Dict]:
+        pass
+
+    def failure_count(self) -> int:
+        return self.failures
+
+
+class SoupCardParser(CardParser):
+    """Parser de referência: BeautifulSoup + `extract_details` do scraper."""
+
+    def parse(self, page: str, tipo: str) -> List[Dict]:
+        soup = BeautifulSoup(page, 'html.parser')
+        cards = soup.find_all('section', attrs=CARD_ATTRS)
+        imoveis = []
+        for card in cards:
+            details = self.scraper.extract_details(card, tipo)
+            if details:
+                imoveis.append(details)
+            else:
+                self.failures += 1
+        return imoveis
+
+
+if lxml_html is not None:
+    _CARDS = etree.XPath('//section[@data-ds-component="DS-AdCard"]')
+    # Mesmo texto que o get_text() do BeautifulSoup: ignora comentários, script e style
+    _TEXT = etree.XPath('.//text()[not(parent::script) and not(parent::style)]')
+
+
+class LxmlCardParser(CardParser):
+    """Parser em C (lxml) que percorre cada card uma única vez.
+
+    Produz exatamente a mesma saída do `SoupCardParser`: os textos crus são
+    coletados aqui e convertidos por `scraper.build_listing`.
+    """
+
+    PRICE = 'olx-ad-card__price'
+    LOCATION = 'olx-ad-card__location'
+    LABELS = 'olx-ad-card__labels-items'
+
+    def _text(self, element, strip: bool) -> str:
+        if strip:
+            return ''.join(t.strip() for t in _TEXT(element) if t.strip())
+        return ''.join(_TEXT(element))
+
+    def _parse_card(self, card, tipo: str) -> Dict:
+        title = link = price = location = labels = None
+        for element in card.iterdescendants(tag=etree.Element):
+            tag = element.tag
+            if tag == 'h2':
+                title = element if title is None else title
+            elif tag == 'a':
+                link = element if link is None else link
+            classes = element.get('class')
+            if classes:
+                classes = classes.split()
+                if price is None and self.PRICE in classes:
+                    price = element
+                if location is None and self.LOCATION in classes:
+                    location = element
+                if labels is None and self.LABELS in classes:
+                    labels = element
+
+        label_texts = None
+        if labels is not None:
+            label_texts = [
+                next(item.iter('span')).attrib['aria-label']
+                for item in labels.iter('li')
+            ]
+
+        return self.scraper.build_listing(
+            tipo,
+            self._text(title, strip=False),
+            self._text(price, strip=True) if price is not None else "0",
+            self._text(location, strip=True) if location is not None else "N/A",
+            link.attrib['href'],
+            label_texts
+        )
+
+    def parse(self, page: str, tipo: str) -> List[Dict]:
+        root = lxml_html.fromstring(page)
+        imoveis = []
+        for card in _CARDS(root):
+            try:
+                details = self._parse_card(card, tipo)
+            except Exception as e:
+                print(f"Erro ao extrair detalhes do card: {e}")
+                self.failures += 1
+                continue
+            imoveis.append(details)
+        return imoveis
+
+
+_NEXT_DATA = re.compile(
+    r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.DOTALL
+)
+
+# Propriedades do anúncio no JSON da OLX -> campo do imóvel
+AD_PROPERTIES = {
+    'rooms': 'num_quartos',
+    'size': 'area',
+    'garage_spaces': 'num_vagas',
+    'bathrooms': 'num_banheiros',
+}
+
+
+class NextDataParser(CardParser):
+    """Lê os anúncios do JSON `__NEXT_DATA__` que a OLX embute na página.
+
+    Não depende das classes CSS dos cards e funciona com a resposta HTTP
+    crua, sem navegador. Quando a página não traz o JSON, delega para
+    `fallback`.
+    """
+
+    def __init__(self, scraper, fallback: Optional[CardParser] = None):
+        super().__init__(scraper)
+        self.fallback = fallback
+
+    def extract_ads(self, page: str) -> Optional[List[Dict]]:
+        match = _NEXT_DATA.search(page)
+        if not match:
+            return None
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            return None
+        ads = data.get('props', {}).get('pageProps', {}).get('ads')
+        if ads is None:
+            return None
+        # A lista também traz banners de publicidade, que não têm listId
+        return [ad for ad in ads if isinstance(ad, dict) and ad.get('listId')]
+
+    def _number(self, value) -> int:
+        if isinstance(value, (int, float)):
+            return int(value)
+        return self.scraper.extract_number(str(value))
+
+    def build_from_ad(self, ad: Dict, tipo: str) -> Dict:
+        counts = {'num_quartos': 0, 'area': 0, 'num_vagas': 0, 'num_banheiros': 0}
+        for prop in ad.get('properties') or []:
+            field = AD_PROPERTIES.get(prop.get('name'))
+            if field:
+                counts[field] = self._number(prop.get('value'))
+
+        details = ad.get('locationDetails') or {}
+        if details.get('municipality'):
+            cidade, bairro = details['municipality'], details.get('neighbourhood') or "N/A"
+        else:
+            bairro, cidade = self.scraper.get_location_info(ad.get('location') or "N/A")
+
+        price = ad.get('price') or "0"
+        date = ad.get('date')
+        return {
+            'titulo': self.scraper.clean_text((ad.get('subject') or ad.get('title') or "").strip()),
+            'tipo': tipo,
+            'preco': float(price) if isinstance(price, (int, float)) else self.scraper.clean_price(price),
+            'cidade': self.scraper.clean_text(cidade),
+            'bairro': self.scraper.clean_text(bairro),
+            'link': ad['url'],
+            'num_quartos': counts['num_quartos'],
+            'num_vagas': counts['num_vagas'],
+            'num_banheiros': counts['num_banheiros'],
+            'area': counts['area'],
+            'ad_id': str(ad['listId']),
+            'data_publicacao': datetime.fromtimestamp(date, tz=timezone.utc).isoformat() if date else None,
+            'imagens': [img.get('original') for img in ad.get('images') or [] if img.get('original')],
+        }
+
+    def parse(self, page: str, tipo: str) -> List[Dict]:
+        ads = self.extract_ads(page)
+        if ads is None:
+            return self.fallback.parse(page, tipo) if self.fallback else []
+        imoveis = []
+        for ad in ads:
+            try:
+                imoveis.append(self.build_from_ad(ad, tipo))
+            except Exception as e:
+                print(f"Erro ao extrair detalhes do anúncio {ad.get('listId')}: {e}")
+                self.failures += 1
+        return imoveis
+
+    def failure_count(self) -> int:
+        return self.failures + (self.fallback.failure_count() if self.fallback else 0)
+
+
+def has_embedded_ads(page: str) -> bool:
+    return '__NEXT_DATA__' in page and '"listId"' in page
+
+
+def default_parser(scraper) -> CardParser:
+    cards = LxmlCardParser(scraper) if lxml_html is not None else SoupCardParser(scraper)
+    return NextDataParser(scraper, fallback=cards)
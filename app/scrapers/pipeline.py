@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from app import metrics
+
+# 0 desativa o pool de processos e parseia na própria thread de download
+PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Páginas baixadas aguardando parse; limita o HTML mantido em memória
+PAGE_QUEUE_SIZE = int(os.getenv("SCRAPER_PAGE_QUEUE_SIZE", "8"))
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool de processos de parse compartilhado por todos os scrapers do processo."""
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: a API e os workers de job já têm threads rodando, o que torna fork inseguro
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_pool
+
+
+def _discard_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """Descarta um pool quebrado; o próximo `get_parse_pool` cria outro.
+
+    Quando um processo de parse morre (falta de memória, crash do lxml), o
+    `ProcessPoolExecutor` inteiro fica inutilizável e falha todas as tarefas.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(cancel_futures=True)
+            _parse_pool = None
+
+
+def _parse(parser, page: str, tipo: str) -> Tuple[List[Dict], float, int]:
+    # Mede no processo que parseia; as métricas são registradas no processo principal
+    failures = parser.failure_count()
+    started = time.perf_counter()
+    imoveis = parser.parse(page, tipo)
+    return imoveis, time.perf_counter() - started, parser.failure_count() - failures
+
+
+def _record_parse(source: str, elapsed: float, imoveis: List[Dict], failures: int) -> None:
+    metrics.SCRAPER_STAGE_SECONDS.observe(elapsed, stage="parse")
+    if imoveis:
+        metrics.SCRAPER_STAGE_SECONDS.observe(elapsed / len(imoveis), stage="extract_card")
+    metrics.SCRAPER_CARDS.inc(len(imoveis), source=source)
+    metrics.SCRAPER_EXTRACTION_FAILURES.inc(failures, source=source)
+    metrics.SCRAPER_PAGES.inc(source=source, status="ok" if imoveis else "empty")
+
+
+def iter_parsed_pages(
+    fetch: Callable[[str], Optional[str]],
+    parser,
+    pages: List[Tuple[int, str]],
+    tipo: str,
+    fetch_workers: int,
+    source: str = ""
+) -> Iterator[Tuple[int, List[Dict]]]:
+    """Baixa e parseia `pages` em duas etapas, entregando cada página ao terminar.
+
+    Threads de download (I/O) colocam o HTML em uma fila limitada; o parse
+    (CPU) roda em um `ProcessPoolExecutor`, fora do GIL. Gera tuplas
+    (número da página, imóveis) na ordem em que ficam prontas. Um erro de
+    download interrompe a geração e é repassado a quem consome. Se o pool
+    de parse quebrar, ele é recriado e cada página afetada é parseada de
+    novo uma vez.
+    """
+    raw = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def fetch_page(page_number: int, url: str) -> None:
+        if stop.is_set():
+            return
+        try:
+            item = (page_number, fetch(url), None)
+        except Exception as e:
+            item = (page_number, None, e)
+        while not stop.is_set():
+            try:
+                raw.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def submit_parse(page_number: int, page: str, retried: bool = False) -> None:
+        parse_pool = get_parse_pool()
+        if parse_pool is not None:
+            try:
+                future = parse_pool.submit(_parse, parser, page, tipo)
+            except BrokenProcessPool:
+                _discard_parse_pool(parse_pool)
+                parse_pool = get_parse_pool()
+                future = parse_pool.submit(_parse, parser, page, tipo)
+        else:
+            future = Future()
+            try:
+                future.set_result(_parse(parser, page, tipo))
+            except Exception as e:
+                future.set_exception(e)
+        pending[future] = (page_number, page, parse_pool, retried)
+
+    def collect(done) -> Iterator[Tuple[int, List[Dict]]]:
+        for future in done:
+            page_number, page, parse_pool, retried = pending.pop(future)
+            try:
+                imoveis, elapsed, failures = future.result()
+            except BrokenProcessPool:
+                if retried:
+                    raise
+                _discard_parse_pool(parse_pool)
+                submit_parse(page_number, page, retried=True)
+                continue
+            _record_parse(source, elapsed, imoveis, failures)
+            yield page_number, imoveis
+
+    fetchers = ThreadPoolExecutor(max_workers=fetch_workers)
+    pending: Dict[Future, Tuple[int, str, Optional[ProcessPoolExecutor], bool]] = {}
+    try:
+        for page_number, url in pages:
+            fetchers.submit(fetch_page, page_number, url)
+
+        for _ in range(len(pages)):
+            # Limita páginas em parse para não acumular HTML sem limite
+            while len(pending) >= PAGE_QUEUE_SIZE:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+
+            page_number, page, error = raw.get()
+            if error is not None:
+                metrics.SCRAPER_PAGES.inc(source=source, status="error")
+                raise error
+            if not page:
+                print(f"[ERROR] Could not get page source for page {page_number}")
+                metrics.SCRAPER_PAGES.inc(source=source, status="error")
+                yield page_number, []
+                continue
+            submit_parse(page_number, page)
+
+            yield from collect([f for f in pending if f.done()])
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+    finally:
+        stop.set()
+        for future in pending:
+            future.cancel()
+        fetchers.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,67 @@
+"""Reprocessa as páginas do cache em disco, sem acessar a rede.
+
+Útil para refazer a extração depois de corrigir o parser (backfill) ou para
+medir só a etapa de parse.
+
+Uso: python -m app.scrapers.replay --tipo venda --estado sp [--ingest]
+"""
+import argparse
+import time
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+from app.scrapers.page_cache import PageCache, get_page_cache
+from app.scrapers.pipeline import iter_parsed_pages, shutdown_parse_pool
+
+
+def page_number(url: str) -> int:
+    return int(parse_qs(urlsplit(url).query).get('o', ['1'])[0])
+
+
+def iter_replayed_pages(scraper, cache: PageCache, tipo: str, estado: str) -> Iterator[Tuple[int, List[Dict]]]:
+    """Gera (número da página, imóveis) da versão mais recente de cada página em cache."""
+    prefix = scraper.page_url(tipo, estado, 1).split('?')[0] + '?'
+    digests = {url: digest for url, _, digest in cache.latest(prefix)}
+    pages = sorted((page_number(url), url) for url in digests)
+    yield from iter_parsed_pages(
+        lambda url: cache.read_blob(digests[url]), scraper.parser, pages, tipo, fetch_workers=2
+    )
+
+
+def main() -> None:
+    from app.scrapers.factory import ScraperFactory
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="olx")
+    parser.add_argument("--tipo", required=True)
+    parser.add_argument("--estado", required=True)
+    parser.add_argument("--ingest", action="store_true", help="grava os imóveis extraídos no banco")
+    args = parser.parse_args()
+
+    cache = get_page_cache()
+    if cache is None:
+        raise SystemExit("SCRAPER_CACHE_DIR não configurado")
+    scraper = ScraperFactory.get_scraper(args.source)
+
+    db = None
+    if args.ingest:
+        from app import crud, database
+        db = database.WriterSessionLocal()
+
+    started = time.perf_counter()
+    pages = cards = 0
+    try:
+        for _, imoveis in iter_replayed_pages(scraper, cache, args.tipo, args.estado):
+            pages += 1
+            cards += len(imoveis)
+            if db is not None:
+                crud.bulk_upsert_imoveis(db, imoveis)
+    finally:
+        if db is not None:
+            db.close()
+        shutdown_parse_pool()
+    elapsed = time.perf_counter() - started
+    print(f"{pages} páginas, {cards} imóveis em {elapsed:.2f}s ({cards / elapsed if elapsed else 0:.0f} imóveis/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+from app.scrapers.fetchers import PageFetcher
+
+INITIAL_RATE = float(os.getenv("SCRAPER_RATE", "0.5"))
+MIN_RATE = float(os.getenv("SCRAPER_MIN_RATE", "0.05"))
+MAX_RATE = float(os.getenv("SCRAPER_MAX_RATE", "4"))
+RATE_STEP = float(os.getenv("SCRAPER_RATE_STEP", "0.05"))
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("SCRAPER_MAX_RETRIES", "3"))
+RETRY_BASE = float(os.getenv("SCRAPER_RETRY_BASE", "2"))
+RETRY_CAP = float(os.getenv("SCRAPER_RETRY_CAP", "60"))
+
+
+class HostScheduler:
+    """Controla o ritmo de requisições a um host.
+
+    Combina um token bucket (requisições por segundo) com um limite de
+    concorrência AIMD: cada sucesso aumenta os dois aos poucos e cada sinal
+    de bloqueio (timeout, 403/429, página vazia ou de verificação) corta os
+    dois pela metade.
+    """
+
+    def __init__(
+        self,
+        rate: float = INITIAL_RATE,
+        min_rate: float = MIN_RATE,
+        max_rate: float = MAX_RATE,
+        max_concurrency: int = MAX_CONCURRENCY
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.limit = 1.0
+        self.in_flight = 0
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @contextmanager
+    def slot(self):
+        """Reserva uma vaga de concorrência e um token antes de cada requisição."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                if wait <= 0:
+                    self._tokens -= 1
+                    break
+                self._cond.wait(wait)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def success(self) -> None:
+        with self._cond:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.rate = min(self.max_rate, self.rate + RATE_STEP)
+            self._cond.notify_all()
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        with self._cond:
+            self.limit = max(1.0, self.limit / 2)
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            print(f"[WARN] Throttled: rate={self.rate:.2f}/s concurrency={int(self.limit)}")
+
+
+_schedulers: Dict[str, HostScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_host_scheduler(url: str) -> HostScheduler:
+    """Scheduler do host de `url`, compartilhado por todos os scrapers do processo."""
+    host = urlsplit(url).netloc.lower()
+    with _schedulers_lock:
+        if host not in _schedulers:
+            _schedulers[host] = HostScheduler()
+        return _schedulers[host]
+
+
+def report_throttle(url: str, retry_after: Optional[float] = None) -> None:
+    get_host_scheduler(url).throttled(retry_after)
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE, cap: float = RETRY_CAP) -> float:
+    """Backoff exponencial com jitter completo."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ScheduledFetcher(PageFetcher):
+    """Aplica o scheduler do host e as novas tentativas a outro fetcher.
+
+    Uma resposta que falha em `is_valid` (sem anúncios ou bloqueada) conta
+    como bloqueio; depois de `max_retries` tentativas devolve o que obteve.
+    """
+
+    def __init__(
+        self,
+        inner: PageFetcher,
+        is_valid: Callable[[str], bool],
+        max_retries: int = MAX_RETRIES
+    ):
+        self.inner = inner
+        self.is_valid = is_valid
+        self.max_retries = max_retries
+
+    def fetch(self, url: str) -> Optional[str]:
+        scheduler = get_host_scheduler(url)
+        page = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = backoff_delay(attempt - 1)
+                print(f"[INFO] Retrying {url} in {delay:.1f}s (attempt {attempt + 1})")
+                time.sleep(delay)
+            try:
+                with scheduler.slot():
+                    page = self.inner.fetch(url)
+            except Exception as e:
+                print(f"[WARN] Fetch failed for {url}: {e}")
+                scheduler.throttled()
+                if attempt == self.max_retries:
+                    raise
+                continue
+            if page and self.is_valid(page):
+                scheduler.success()
+                return page
+            scheduler.throttled()
+        return page
+
+    def close(self) -> None:
+        self.inner.close()
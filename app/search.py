@@ -0,0 +1,114 @@
+import logging
+from typing import Dict, List
+from sqlalchemy import inspect, literal_column, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from app import models, utils
+
+logger = logging.getLogger(__name__)
+
+# Colunas de texto com cópia normalizada (sem acento, minúscula) em `<coluna>_norm`
+SEARCH_COLUMNS = ('cidade', 'bairro', 'tipo')
+
+# Tamanho mínimo de termo aceito pelo tokenizer trigram do FTS5
+FTS_MIN_LENGTH = 3
+
+_fts_enabled = False
+
+
+def normalized_values(data: Dict) -> Dict:
+    """Valores das colunas `_norm` para os campos de busca presentes em `data`."""
+    return {
+        f"{col}_norm": utils.normalize_string(data[col]) if data[col] is not None else None
+        for col in SEARCH_COLUMNS if col in data
+    }
+
+
+def setup_fulltext(engine: Engine) -> bool:
+    """Cria a tabela FTS5 (trigram) e os triggers que a mantêm em sincronia.
+
+    Só se aplica ao SQLite e depois que as colunas `_norm` existem (veja
+    `migrations.add_search_columns`). Em builds do SQLite sem FTS5 ou sem o
+    tokenizer trigram (anteriores à 3.34), a busca `contains` continua com
+    LIKE. Retorna se a busca FTS está ativa.
+    """
+    global _fts_enabled
+    if engine.dialect.name != "sqlite":
+        return False
+    columns = {c["name"] for c in inspect(engine).get_columns("imoveis")}
+    norm_cols = [f"{col}_norm" for col in SEARCH_COLUMNS]
+    if not set(norm_cols) <= columns:
+        logger.warning("Colunas de busca ausentes; execute app/migrations.py para ativar o FTS")
+        return False
+
+    try:
+        _create_fulltext(engine, norm_cols)
+    except OperationalError as e:
+        logger.warning(f"FTS5 trigram indisponível neste SQLite ({e.orig}); a busca usa LIKE")
+        _fts_enabled = False
+        return False
+    _fts_enabled = True
+    return True
+
+
+def _create_fulltext(engine: Engine, norm_cols: List[str]) -> None:
+    cols = ", ".join(norm_cols)
+    new_values = ", ".join(f"new.{c}" for c in norm_cols)
+    old_values = ", ".join(f"old.{c}" for c in norm_cols)
+    with engine.begin() as connection:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'imoveis_fts'"
+        )).first()
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS imoveis_fts USING fts5({cols}, "
+            "content='imoveis', content_rowid='id', tokenize='trigram')"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS imoveis_fts_ai AFTER INSERT ON imoveis BEGIN "
+            f"INSERT INTO imoveis_fts(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS imoveis_fts_ad AFTER DELETE ON imoveis BEGIN "
+            f"INSERT INTO imoveis_fts(imoveis_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS imoveis_fts_au AFTER UPDATE OF {cols} ON imoveis BEGIN "
+            f"INSERT INTO imoveis_fts(imoveis_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO imoveis_fts(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        ))
+        if not exists:
+            connection.execute(text("INSERT INTO imoveis_fts(imoveis_fts) VALUES ('rebuild')"))
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def apply_text_filter(query, column: str, value: str, mode: str = 'contains'):
+    """Filtra `query` por uma coluna de busca usando a cópia normalizada.
+
+    - exact: igualdade, usa o índice da coluna `_norm`
+    - prefix: intervalo [valor, próximo valor), também usa o índice
+    - contains: FTS5 trigram no SQLite; LIKE nos demais casos
+    """
+    if column not in SEARCH_COLUMNS:
+        raise ValueError(f"Coluna sem busca normalizada: {column}")
+    term = utils.normalize_string(value)
+    norm_col = getattr(models.Imovel, f"{column}_norm")
+    if not term:
+        return query
+
+    if mode == 'exact':
+        return query.filter(norm_col == term)
+    if mode == 'prefix':
+        return query.filter(norm_col >= term, norm_col < _prefix_upper_bound(term))
+    if mode != 'contains':
+        raise ValueError(f"Modo de busca inválido: {mode}")
+
+    if _fts_enabled and len(term) >= FTS_MIN_LENGTH:
+        param = f"fts_{column}"
+        matches = text(f"SELECT rowid FROM imoveis_fts WHERE imoveis_fts MATCH :{param}").bindparams(
+            **{param: f'{column}_norm : "{term}"'}
+        ).columns(literal_column("rowid"))
+        return query.filter(models.Imovel.id.in_(matches))
+    return query.filter(norm_col.like(f"%{term}%"))
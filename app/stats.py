@@ -0,0 +1,188 @@
+import math
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from app import database, models, search, utils
+
+# Largura relativa de cada faixa do histograma: percentis aproximados com erro de até ~2%
+BUCKET_RATIO = 1.02
+
+# Parâmetro de agrupamento da API -> coluna da tabela de rollup
+STATS_GROUPS = {
+    'cidade': 'cidade_norm',
+    'bairro': 'bairro_norm',
+    'tipo': 'tipo_norm',
+    'num_quartos': 'num_quartos',
+}
+
+SNAPSHOT_FIELDS = ('cidade', 'bairro', 'tipo', 'num_quartos', 'preco')
+
+
+def bucket_for(preco: float) -> int:
+    return math.floor(math.log(preco) / math.log(BUCKET_RATIO))
+
+
+def bucket_bounds(bucket: int) -> tuple:
+    return BUCKET_RATIO ** bucket, BUCKET_RATIO ** (bucket + 1)
+
+
+def snapshot(imovel) -> Dict:
+    """Campos de um `models.Imovel` que afetam os rollups, antes de alterá-lo."""
+    return {f: getattr(imovel, f) for f in SNAPSHOT_FIELDS}
+
+
+class RollupDeltas:
+    """Acumula variações dos rollups para aplicá-las em um único upsert."""
+
+    def __init__(self):
+        self.entries: Dict[tuple, list] = {}
+
+    def _key(self, data: Dict) -> Optional[tuple]:
+        preco = data.get('preco')
+        if not preco or preco <= 0:
+            return None
+        norm = search.normalized_values(data)
+        return (
+            norm.get('cidade_norm') or '',
+            norm.get('bairro_norm') or '',
+            norm.get('tipo_norm') or '',
+            data.get('num_quartos') or 0,
+            bucket_for(preco),
+        )
+
+    def _add(self, data: Dict, sign: int) -> None:
+        key = self._key(data)
+        if key is None:
+            return
+        entry = self.entries.setdefault(key, [0, 0.0, None, None])
+        entry[0] += sign
+        entry[1] += sign * data['preco']
+        if sign > 0:
+            entry[2] = data['preco'] if entry[2] is None else min(entry[2], data['preco'])
+            entry[3] = data['preco'] if entry[3] is None else max(entry[3], data['preco'])
+
+    def added(self, data: Dict) -> None:
+        self._add(data, 1)
+
+    def removed(self, data: Dict) -> None:
+        self._add(data, -1)
+
+    def changed(self, old: Dict, new: Dict) -> None:
+        self.removed(old)
+        self.added(new)
+
+    def apply(self, db: Session) -> None:
+        """Grava as variações na sessão atual; o commit fica com quem chamou."""
+        entries = {k: v for k, v in self.entries.items() if v[0] != 0 or v[2] is not None}
+        if not entries:
+            return
+        table = models.PriceRollup.__table__
+        key_cols = list(models.PriceRollup.GROUP_COLUMNS) + ['bucket']
+        least = func.least if db.get_bind().dialect.name == "postgresql" else func.min
+        greatest = func.greatest if db.get_bind().dialect.name == "postgresql" else func.max
+
+        stmt = database.dialect_insert(db)(table).values([
+            dict(zip(key_cols, key), count=count, preco_sum=total, preco_min=low, preco_max=high)
+            for key, (count, total, low, high) in entries.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_cols,
+            set_={
+                'count': table.c.count + stmt.excluded.count,
+                'preco_sum': table.c.preco_sum + stmt.excluded.preco_sum,
+                'preco_min': func.coalesce(least(table.c.preco_min, stmt.excluded.preco_min),
+                                           table.c.preco_min, stmt.excluded.preco_min),
+                'preco_max': func.coalesce(greatest(table.c.preco_max, stmt.excluded.preco_max),
+                                           table.c.preco_max, stmt.excluded.preco_max),
+            }
+        )
+        db.execute(stmt)
+
+        shrunk = [key for key, (count, *_) in entries.items() if count < 0]
+        if shrunk:
+            db.query(models.PriceRollup).filter(
+                tuple_(*[getattr(models.PriceRollup, c) for c in key_cols]).in_(shrunk),
+                models.PriceRollup.count <= 0
+            ).delete(synchronize_session=False)
+        self.entries = {}
+
+
+def rebuild(db: Session, chunk_size: int = 10000) -> int:
+    """Recalcula todos os rollups a partir da tabela de imóveis."""
+    db.query(models.PriceRollup).delete()
+    deltas = RollupDeltas()
+    total = 0
+    columns = [getattr(models.Imovel, f) for f in SNAPSHOT_FIELDS]
+    for row in db.query(*columns).yield_per(chunk_size):
+        deltas.added(dict(zip(SNAPSHOT_FIELDS, row)))
+        total += 1
+    deltas.apply(db)
+    db.commit()
+    return total
+
+
+def _percentile(buckets: List[tuple], count: int, low: float, high: float, p: float) -> float:
+    target = p / 100 * count
+    seen = 0
+    for bucket, bucket_count, bucket_min, bucket_max in buckets:
+        if seen + bucket_count >= target:
+            lo, hi = bucket_bounds(bucket)
+            lo = max(lo, bucket_min or lo)
+            hi = min(hi, bucket_max or hi)
+            fraction = (target - seen) / bucket_count if bucket_count else 0
+            return min(max(lo + (hi - lo) * fraction, low), high)
+        seen += bucket_count
+    return high
+
+
+def price_stats(
+    db: Session,
+    group_by: List[str],
+    filters: Optional[Dict] = None,
+    percentiles: Iterable[float] = (25, 75, 90),
+    limit: int = 100
+) -> List[Dict]:
+    """Estatísticas de preço por grupo lidas só dos rollups, sem varrer `imoveis`.
+
+    Mínimo, máximo e média são exatos enquanto não há remoções; mediana e
+    percentis são interpolados dentro das faixas do histograma.
+    """
+    rollup = models.PriceRollup
+    group_cols = [getattr(rollup, STATS_GROUPS[g]) for g in group_by]
+    query = db.query(
+        *group_cols,
+        rollup.bucket,
+        func.sum(rollup.count),
+        func.sum(rollup.preco_sum),
+        func.min(rollup.preco_min),
+        func.max(rollup.preco_max),
+    )
+    for key, value in (filters or {}).items():
+        column = getattr(rollup, STATS_GROUPS[key])
+        query = query.filter(column == (value if key == 'num_quartos' else utils.normalize_string(value)))
+    query = query.group_by(*group_cols, rollup.bucket).order_by(*group_cols, rollup.bucket)
+
+    groups: Dict[tuple, list] = {}
+    for row in query:
+        *group, bucket, count, total, low, high = row
+        if count > 0:
+            groups.setdefault(tuple(group), []).append((bucket, count, total, low, high))
+
+    results = []
+    for group, buckets in groups.items():
+        count = sum(b[1] for b in buckets)
+        total = sum(b[2] for b in buckets)
+        low = min(b[3] for b in buckets if b[3] is not None)
+        high = max(b[4] for b in buckets if b[4] is not None)
+        histogram = [(b[0], b[1], b[3], b[4]) for b in buckets]
+        results.append({
+            'group': dict(zip(group_by, group)),
+            'count': count,
+            'min': low,
+            'max': high,
+            'mean': total / count,
+            'median': _percentile(histogram, count, low, high, 50),
+            'percentiles': {f"p{p:g}": _percentile(histogram, count, low, high, p) for p in percentiles},
+        })
+    results.sort(key=lambda r: r['count'], reverse=True)
+    return results[:limit]
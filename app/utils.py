@@ -1,8 +1,9 @@
-import os
+import base64
+import hashlib
+import json
 import unicodedata
 import re
-import pandas as pd
-from typing import List, Dict, Optional
+from urllib.parse import urlsplit
 
 def normalize_string(text: str) -> str:
     if not isinstance(text, str):
@@ -15,52 +16,46 @@ def normalize_string(text: str) -> str:
     normalized = ' '.join(normalized.split())
     return normalized.lower().strip()
 
+AD_ID_PATTERN = re.compile(r'-(\d{6,})/?$')
+
+def listing_identity(link: str) -> str:
+    """Identidade estável de um anúncio a partir do link.
+
+    Usa o ID numérico do anúncio quando o link termina nele (padrão da OLX);
+    senão, um hash do link sem query string nem fragmento.
+    """
+    parts = urlsplit(link.strip())
+    host = parts.netloc.lower()
+    path = parts.path.rstrip('/')
+    match = AD_ID_PATTERN.search(path)
+    if match and 'olx' in host:
+        return f"olx:{match.group(1)}"
+    canonical = f"{host.removeprefix('www.')}{path}"
+    return "sha1:" + hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+def content_hash(values) -> str:
+    """Hash estável de valores serializáveis em JSON, usado para detectar mudanças."""
+    raw = json.dumps(values, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
 def strings_match(str1: str, str2: str) -> bool:
     if not str1 or not str2:
         return False
     norm1 = normalize_string(str1)
     norm2 = normalize_string(str2)
-    print(f"Comparing: {norm1} with {norm2}")
     return norm1 in norm2 or norm2 in norm1
 
-def export_to_excel(data: List[Dict], filter_params: Optional[Dict] = None, output_dir: str = "exports/excel") -> str:
-    if not data:
-        raise ValueError("No data to export")
-        
-    if filter_params is None:
-        filter_params = {}
-
-    filtered_data = []
-    for imovel in data:
-        match = True
-        for key, value in filter_params.items():
-            imovel_value = imovel.get(key, '')
-            if not strings_match(str(imovel_value), str(value)):
-                match = False
-                break
-        if match:
-            filtered_data.append(imovel)
-    
-    if not filtered_data:
-        raise ValueError(f"No matches found for filters: {filter_params}")
-
-    df = pd.DataFrame(filtered_data)
-    
-    # Criar diretório se não existir
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Definir nome do arquivo
-    nome_arquivo = "imoveis"
-    if filter_params:
-        partes = [f"{key}_{value.replace(' ', '_')}" for key, value in filter_params.items()]
-        nome_arquivo += "_" + "_".join(partes)
-    nome_arquivo += ".xlsx"
-
-    # Caminho completo do arquivo
-    caminho_arquivo = os.path.join(output_dir, nome_arquivo)
-
-    # Exportar para Excel
-    df.to_excel(caminho_arquivo, index=False, engine='openpyxl')
-
-    # Retornar apenas o caminho do arquivo
-    return caminho_arquivo
\ No newline at end of file
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> list:
+    """Decodifica um cursor de `encode_cursor`; levanta ValueError se inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return values
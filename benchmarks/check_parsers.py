@@ -0,0 +1,58 @@
+"""Compara, campo a campo, a saída do parser rápido com a do parser BeautifulSoup.
+
+Páginas que também trazem o JSON `__NEXT_DATA__` têm a saída do
+`NextDataParser` conferida contra a dos cards nos campos em comum.
+
+Uso: python -m benchmarks.check_parsers [arquivos.html ...]
+
+Sem argumentos, usa todas as páginas salvas em benchmarks/fixtures/olx.
+Termina com código 1 se algum card divergir.
+"""
+import glob
+import os
+import sys
+from app.scrapers.olx import OLXScraper
+from app.scrapers.parsers import LxmlCardParser, NextDataParser, SoupCardParser, has_embedded_ads
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "olx")
+
+
+def compare_results(expected: list, actual: list, fields=None) -> list:
+    problems = []
+    if len(expected) != len(actual):
+        problems.append(f"{len(expected)} cards esperados, {len(actual)} obtidos")
+    for i, (exp, act) in enumerate(zip(expected, actual)):
+        for field in sorted(fields or set(exp) | set(act)):
+            if exp.get(field) != act.get(field):
+                problems.append(f"card {i} campo {field}: {exp.get(field)!r} != {act.get(field)!r}")
+    return problems
+
+
+def compare_page(scraper: OLXScraper, path: str, tipo: str = "venda") -> list:
+    with open(path, encoding="utf-8") as f:
+        page = f.read()
+    expected = SoupCardParser(scraper).parse(page, tipo)
+    problems = compare_results(expected, LxmlCardParser(scraper).parse(page, tipo))
+    if has_embedded_ads(page):
+        problems += [
+            f"__NEXT_DATA__: {problem}" for problem in
+            compare_results(expected, NextDataParser(scraper).parse(page, tipo), fields=set(expected[0]) if expected else None)
+        ]
+    return problems
+
+
+def main(paths: list) -> int:
+    scraper = OLXScraper()
+    failed = False
+    for path in paths or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        problems = compare_page(scraper, path)
+        status = "FALHOU" if problems else "ok"
+        print(f"[{status}] {os.path.basename(path)}")
+        for problem in problems:
+            print(f"    {problem}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
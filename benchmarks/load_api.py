@@ -0,0 +1,112 @@
+"""Teste de carga dos endpoints de leitura: latência p50/p99 e requisições por segundo.
+
+Uso: python -m benchmarks.load_api [--url http://127.0.0.1:8000] [--concurrency 64]
+     [--requests 2000] [--path /imoveis/total ...] [--output resultado.json]
+     [--baseline anterior.json]
+
+Sem --url, chama o app em processo (ASGI), sem rede nem workers de scraping.
+Em `--path`, `{id}` é trocado por um id aleatório entre 1 e --max-id, para
+que o cache de respostas não atenda tudo. Para comparar antes e depois de
+uma mudança, grave o resultado de uma versão com --output e passe o arquivo
+como --baseline na outra.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Dict, List
+import httpx
+
+DEFAULT_PATHS = ["/imoveis/total", "/imoveis/{id}", "/imoveis/?skip={id}&limit=20", "/imoveis/page?limit=50"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_path(client: httpx.AsyncClient, path: str, total: int, concurrency: int, max_id: int) -> Dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            url = path.replace("{id}", str(random.randint(1, max_id)))
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                failed = response.status_code >= 500
+            except Exception:
+                # Em processo, exceções do app (ex: pool esgotado) chegam aqui
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+async def run(args) -> Dict[str, Dict]:
+    if args.url:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=args.concurrency))
+        base_url = args.url
+    else:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+        for path in args.path or DEFAULT_PATHS:
+            results[path] = await run_path(client, path, args.requests, args.concurrency, args.max_id)
+    return results
+
+
+def report(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    print(f"{'endpoint':40} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'erros':>6}")
+    for path, r in results.items():
+        print(f"{path:40} {r['rps']:9.0f} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} {r['errors']:6}")
+        before = baseline.get(path)
+        if before:
+            print(
+                f"{'  vs baseline':40} {r['rps'] / before['rps']:8.2f}x "
+                f"{r['p50_ms'] / before['p50_ms']:8.2f}x {r['p99_ms'] / before['p99_ms']:8.2f}x"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="API já rodando; sem isso usa o app em processo")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000, help="requisições por endpoint")
+    parser.add_argument("--max-id", type=int, default=1000)
+    parser.add_argument("--path", action="append", help="endpoint a testar (repetível)")
+    parser.add_argument("--output", help="grava os resultados em JSON")
+    parser.add_argument("--baseline", help="resultados anteriores para comparação")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
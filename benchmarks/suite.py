@@ -0,0 +1,344 @@
+"""Suíte de benchmarks offline: parse, ingestão, consultas e exportação.
+
+Uso: python -m benchmarks.suite [--rows 100000] [--only parse,ingest,query,export]
+     [--output resultado.json] [--baseline anterior.json] [--tolerance 0.15]
+
+Roda sem rede, em um banco SQLite temporário (ou em --database-url, que
+deve ser um banco descartável: os dados sintéticos são gravados nele).
+Etapas:
+
+- parse: cards/s de cada parser nas páginas salvas em benchmarks/fixtures/olx
+  (o `SoupCardParser` é o caminho de `OLXScraper.extract_details`);
+- ingest: gera --rows imóveis sintéticos e mede linhas/s do
+  `bulk_upsert_imoveis` (inserção e reingestão sem mudanças) e do
+  `create_or_update_imovel` (inserção e atualização, em --single-rows linhas);
+- query: latência p50/p99 de `get_filtered_imoveis` e de `GET /imoveis/`;
+- export: tempo, tamanho e pico de memória (tracemalloc) de `POST /export/excel`.
+
+Os resultados são gravados em JSON com --output; com --baseline, cada
+métrica é comparada à anterior e o comando termina com código 1 se alguma
+piorar mais que --tolerance. O cache de respostas fica desligado, para as
+leituras medirem o banco.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+from benchmarks.load_api import percentile
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "olx")
+STEPS = ("parse", "ingest", "query", "export")
+
+CIDADES = {
+    "São Paulo": ["Pinheiros", "Moema", "Vila Mariana", "Tatuapé", "Itaim Bibi", "Santana"],
+    "Rio de Janeiro": ["Copacabana", "Botafogo", "Tijuca", "Barra da Tijuca", "Méier"],
+    "Belo Horizonte": ["Savassi", "Funcionários", "Pampulha", "Buritis"],
+    "Curitiba": ["Batel", "Água Verde", "Centro", "Portão"],
+    "Porto Alegre": ["Moinhos de Vento", "Petrópolis", "Menino Deus"],
+}
+TIPOS = ("venda", "aluguel")
+TITULOS = ("Apartamento", "Casa", "Cobertura", "Studio", "Sobrado", "Kitnet")
+
+
+def synthetic_imoveis(count: int, seed: int = 42, start: int = 0) -> Iterator[Dict]:
+    """Gera imóveis no formato dos scrapers, determinísticos para um `seed`."""
+    rng = random.Random(seed)
+    cidades = list(CIDADES)
+    for i in range(start, start + count):
+        cidade = rng.choice(cidades)
+        tipo = rng.choice(TIPOS)
+        quartos = rng.randint(0, 5)
+        base = 350_000 if tipo == "venda" else 2_500
+        yield {
+            "titulo": f"{rng.choice(TITULOS)} com {quartos} quartos",
+            "tipo": tipo,
+            "preco": round(base * rng.uniform(0.3, 4.0), 2),
+            "cidade": cidade,
+            "bairro": rng.choice(CIDADES[cidade]),
+            "num_quartos": quartos,
+            "num_vagas": rng.randint(0, 3),
+            "num_banheiros": rng.randint(1, 4),
+            "link": f"https://sp.olx.com.br/imoveis/anuncio-sintetico-{1_000_000_000 + i}",
+        }
+
+
+def _chunks(items: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _metric(value: float, unit: str, better: str = "higher") -> Dict:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def _latencies(prefix: str, samples: List[float]) -> Dict[str, Dict]:
+    return {
+        f"{prefix}.p50": _metric(percentile(samples, 50) * 1000, "ms", "lower"),
+        f"{prefix}.p99": _metric(percentile(samples, 99) * 1000, "ms", "lower"),
+        f"{prefix}.mean": _metric(statistics.fmean(samples) * 1000, "ms", "lower"),
+    }
+
+
+async def asgi_request(app, method: str, path: str) -> tuple:
+    """Chama o app ASGI diretamente e descarta o corpo à medida que chega.
+
+    Retorna (status, bytes recebidos); ao contrário do transporte ASGI do
+    httpx, não acumula a resposta, para o pico de memória ser o do app.
+    """
+    url_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": url_path, "raw_path": url_path.encode(),
+        "query_string": query.encode(), "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    status = 0
+    received = 0
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Respostas em streaming aguardam uma desconexão que só vem no fim
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, received
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return status, received
+
+
+def bench_parse(repeat: int) -> Dict[str, Dict]:
+    from app.scrapers.olx import OLXScraper
+    from app.scrapers.parsers import LxmlCardParser, NextDataParser, SoupCardParser
+
+    scraper = OLXScraper()
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        # listing_<tipo>_<estado>...html
+        tipo = os.path.basename(path).split("_")[1]
+        with open(path, encoding="utf-8") as f:
+            pages.append((f.read(), tipo))
+
+    results = {}
+    for name, parser in (
+        ("soup", SoupCardParser(scraper)),
+        ("lxml", LxmlCardParser(scraper)),
+        ("next_data", NextDataParser(scraper)),
+    ):
+        cards = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for page, tipo in pages:
+                cards += len(parser.parse(page, tipo))
+        elapsed = time.perf_counter() - started
+        results[f"parse.{name}.cards_per_s"] = _metric(cards / elapsed, "cards/s")
+    return results
+
+
+def seed(rows: int, batch: int) -> float:
+    """Semeia o banco com `rows` imóveis sintéticos; retorna o tempo gasto."""
+    from app import crud, database
+
+    started = time.perf_counter()
+    with database.SessionLocal() as db:
+        for chunk in _chunks(synthetic_imoveis(rows), batch):
+            crud.bulk_upsert_imoveis(db, chunk)
+    return time.perf_counter() - started
+
+
+def bench_ingest(rows: int, single_rows: int, batch: int) -> Dict[str, Dict]:
+    from app import crud, database, schemas
+
+    results = {"ingest.bulk_insert.rows_per_s": _metric(rows / seed(rows, batch), "rows/s")}
+    with database.SessionLocal() as db:
+        sample = list(synthetic_imoveis(min(rows, batch)))
+        started = time.perf_counter()
+        crud.bulk_upsert_imoveis(db, sample)
+        results["ingest.bulk_unchanged.rows_per_s"] = _metric(len(sample) / (time.perf_counter() - started), "rows/s")
+
+        # Fora do intervalo semeado, para a primeira passada só inserir
+        fresh = [schemas.ImovelCreate(**imovel) for imovel in synthetic_imoveis(single_rows, seed=7, start=rows)]
+        started = time.perf_counter()
+        for imovel in fresh:
+            crud.create_or_update_imovel(db, imovel)
+        results["ingest.create_or_update.insert.rows_per_s"] = _metric(
+            single_rows / (time.perf_counter() - started), "rows/s"
+        )
+
+        changed = [imovel.model_copy(update={"preco": imovel.preco * 0.95}) for imovel in fresh]
+        started = time.perf_counter()
+        for imovel in changed:
+            crud.create_or_update_imovel(db, imovel)
+        results["ingest.create_or_update.update.rows_per_s"] = _metric(
+            single_rows / (time.perf_counter() - started), "rows/s"
+        )
+    return results
+
+
+def bench_query(app, rows: int, repeat: int) -> Dict[str, Dict]:
+    from app import crud, database, utils
+
+    rng = random.Random(1)
+    filters = []
+    for cidade, bairros in CIDADES.items():
+        filters.append({"cidade": utils.normalize_string(cidade)})
+        filters.append({
+            "cidade": utils.normalize_string(cidade),
+            "bairro": utils.normalize_string(bairros[0]),
+            "tipo": "aluguel",
+        })
+
+    samples = []
+    matched = 0
+    with database.SessionLocal() as db:
+        for _ in range(repeat):
+            params = rng.choice(filters)
+            started = time.perf_counter()
+            matched += len(crud.get_filtered_imoveis(db, params))
+            samples.append(time.perf_counter() - started)
+    results = _latencies("query.get_filtered_imoveis", samples)
+    results["query.get_filtered_imoveis.rows_per_call"] = _metric(matched / repeat, "rows", "info")
+
+    async def read_pages():
+        latencies = []
+        for _ in range(repeat):
+            path = f"/imoveis/?skip={rng.randrange(max(1, rows - 100))}&limit=100"
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, "GET", path)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                raise RuntimeError(f"GET {path} retornou {status}")
+        return latencies
+
+    results.update(_latencies("query.read_imoveis", asyncio.run(read_pages())))
+    return results
+
+
+def bench_export(app) -> Dict[str, Dict]:
+    # Duas passadas: o tracemalloc deixa a exportação várias vezes mais lenta
+    started = time.perf_counter()
+    status, size = asyncio.run(asgi_request(app, "POST", "/export/excel"))
+    elapsed = time.perf_counter() - started
+    if status != 200:
+        raise RuntimeError(f"POST /export/excel retornou {status}")
+    tracemalloc.start()
+    asyncio.run(asgi_request(app, "POST", "/export/excel"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "export.excel.seconds": _metric(elapsed, "s", "lower"),
+        "export.excel.size": _metric(size / 2**20, "MiB", "info"),
+        "export.excel.peak_memory": _metric(peak / 2**20, "MiB", "lower"),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Imprime as métricas (e a razão sobre a baseline) e retorna as que pioraram."""
+    regressions = []
+    print(f"{'métrica':48} {'valor':>14} {'':7} {'baseline':>14} {'razão':>7}")
+    for name, metric in results.items():
+        line = f"{name:48} {metric['value']:14.2f} {metric['unit']:7}"
+        before = baseline.get(name)
+        if before and before["value"]:
+            ratio = metric["value"] / before["value"]
+            worse = (
+                metric["better"] == "higher" and ratio < 1 - tolerance
+                or metric["better"] == "lower" and ratio > 1 + tolerance
+            )
+            line += f" {before['value']:14.2f} {ratio:6.2f}x"
+            if worse:
+                line += "  PIOROU"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="imóveis sintéticos semeados no banco")
+    parser.add_argument("--single-rows", type=int, default=1000, help="linhas medidas no create_or_update_imovel")
+    parser.add_argument("--batch", type=int, default=5000, help="imóveis por chamada do bulk_upsert_imoveis")
+    parser.add_argument("--repeat", type=int, default=50, help="repetições do parse e de cada consulta")
+    parser.add_argument("--only", help=f"etapas separadas por vírgula ({','.join(STEPS)})")
+    parser.add_argument("--database-url", help="banco descartável; padrão: SQLite temporário")
+    parser.add_argument("--output", help="grava os resultados em JSON")
+    parser.add_argument("--baseline", help="resultados anteriores para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="piora relativa aceita sobre a baseline")
+    args = parser.parse_args()
+    steps = args.only.split(",") if args.only else list(STEPS)
+
+    workdir = tempfile.mkdtemp(prefix="imoveis-bench-") if not args.database_url else ""
+    # Antes de importar o app: banco, cache de páginas e de respostas
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["SCRAPER_CACHE_DIR"] = ""
+    os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+    from app.main import app
+
+    results = {}
+    if "parse" in steps:
+        results.update(bench_parse(args.repeat))
+    if "ingest" in steps:
+        results.update(bench_ingest(args.rows, args.single_rows, args.batch))
+    elif "query" in steps or "export" in steps:
+        seed(args.rows, args.batch)
+    if "query" in steps:
+        results.update(bench_query(app, args.rows, args.repeat))
+    if "export" in steps:
+        results.update(bench_export(app))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if args.output:
+        meta = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "args": vars(args),
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+    if not args.database_url:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if regressions:
+        print(f"{len(regressions)} métrica(s) piorou(aram) mais que {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())